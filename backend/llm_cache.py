@@ -0,0 +1,108 @@
+"""LLM response caching for the Zark-AI backend.
+
+``ResponseCache`` is the in-process tier. ``LLMCache`` layers it in front of
+an optional shared ``CacheBackend`` so workers reuse each other's answers.
+"""
+from typing import Dict, Any, Optional, Protocol
+from datetime import datetime
+from collections import OrderedDict
+import hashlib
+import time
+
+class ResponseCache:
+    """In-process TTL/LRU cache for LLM output, keyed on a hash of the full prompt.
+
+    Only exact keys hit: a similar-looking query can ask something different
+    or be answered from different context, so it never reuses an entry.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: int = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._exact = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        return hashlib.blake2b("\x1f".join(parts).encode(), digest_size=16).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._exact.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self._exact.pop(key, None)
+            self.misses += 1
+            return None
+        self._exact.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: str, value: str):
+        self._exact[key] = (time.monotonic() + self.ttl, value)
+        self._exact.move_to_end(key)
+        while len(self._exact) > self.maxsize:
+            self._exact.popitem(last=False)
+
+    def clear(self):
+        self._exact.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._exact),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+class CacheBackend(Protocol):
+    """Shared cache tier keyed on the exact prompt hash"""
+
+    async def get(self, key: str) -> Optional[str]: ...
+
+    async def set(self, key: str, query: str, value: str) -> None: ...
+
+
+class MongoCacheBackend:
+    """Shared tier in a Mongo collection; a TTL index on ``ts`` expires entries"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            entry = await self.collection.find_one({"key": key}, {"_id": 0, "response": 1})
+            return entry["response"] if entry else None
+        except Exception as e:
+            print(f"Shared cache lookup error: {e}")
+            return None
+
+    async def set(self, key: str, query: str, value: str) -> None:
+        try:
+            await self.collection.update_one(
+                {"key": key},
+                {"$set": {"query": query, "response": value, "ts": datetime.utcnow()}},
+                upsert=True
+            )
+        except Exception as e:
+            print(f"Shared cache store error: {e}")
+
+
+class LLMCache:
+    """Local, then shared exact-key lookup in front of an LLM call"""
+
+    def __init__(self, local: ResponseCache, shared: Optional[CacheBackend] = None):
+        self.local = local
+        self.shared = shared
+
+    async def get(self, key: str) -> Optional[str]:
+        cached = self.local.get(key)
+        if cached is None and self.shared is not None:
+            cached = await self.shared.get(key)
+            if cached is not None:
+                self.local.set(key, cached)
+        return cached
+
+    async def set(self, key: str, query: str, value: str):
+        self.local.set(key, value)
+        if self.shared is not None:
+            await self.shared.set(key, query, value)
@@ -1,25 +1,89 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Header
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from pymongo import MongoClient
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, IndexModel, DESCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError
 import os
 from typing import List, Dict, Any, Optional
 import httpx
 import asyncio
 from datetime import datetime
 import uuid
-from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
 import re
 import json
-from groq import Groq
+import orjson
+import hashlib
+import time
+import heapq
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+from collections import Counter
+from contextlib import asynccontextmanager
+from groq import AsyncGroq
 from urllib.parse import urljoin, urlparse
 from dotenv import load_dotenv
+from llm_cache import ResponseCache, LLMCache, MongoCacheBackend
 
 # Load environment variables
 load_dotenv()
 
+# Precompiled text-processing patterns
+# Entity scan: units first so "50 percent" wins over a bare number, then dates, then proper nouns
+_RE_ENTITY = re.compile(
+    r'(?P<number>\b\d+(?:\.\d+)?\s*(?i:percent|%|million|billion|thousand|km|miles|years?|days?)\b)'
+    r'|(?P<date>\b\d{4}\b|\b\d{1,2}/\d{1,2}/\d{4}\b|\b\d{1,2}\s\w+\s\d{4}\b)'
+    r'|(?P<proper>\b[A-Z][a-z]+(?:\s[A-Z][a-z]+)*\b)'
+)
+_RE_WS = re.compile(r'\s+')
+_RE_TOKEN = re.compile(r'\b\w+\b')
+_RE_QUOTED = re.compile(r'"([^"]+)"')
+_RE_WORD3 = re.compile(r'\b[a-zA-Z]{3,}\b')
+_RE_JSON_LIST = re.compile(r'\[.*\]', re.DOTALL)
+_RE_SENTENCE = re.compile(r'(?<=[.!?])\s+')
+_RE_HREF = re.compile(rb'<a\s[^>]*?href=["\']([^"\']+)["\']', re.IGNORECASE)
+
+# Common words that carry no search signal, dropped from query tokens, tags and keywords
+_STOP_WORDS = frozenset({
+    "the", "and", "for", "with", "that", "this", "from", "your", "have", "been",
+    "are", "was", "were", "will", "would", "could", "should", "they", "them", "their",
+    "there", "what", "when", "where", "which", "who", "why", "how", "about", "into",
+    "than", "then", "also", "more", "most", "some", "such", "only", "other", "over",
+    "can", "not", "you", "our", "its", "has", "had", "but", "all", "any", "each",
+    "these", "those", "very", "just", "like", "does", "did", "tell", "please"
+})
+MAX_QUERY_TOKENS = 6
+
+# Topic categories detected by substring match in extract_enhanced_tags
+TOPIC_CATEGORIES = {
+    'technology': ['technology', 'software', 'computer', 'digital', 'internet', 'ai', 'artificial intelligence', 'machine learning'],
+    'science': ['science', 'research', 'study', 'experiment', 'discovery', 'theory'],
+    'history': ['history', 'historical', 'ancient', 'century', 'war', 'empire'],
+    'geography': ['country', 'city', 'region', 'continent', 'ocean', 'mountain'],
+    'business': ['company', 'business', 'economy', 'market', 'industry', 'financial'],
+    'health': ['health', 'medical', 'disease', 'treatment', 'medicine', 'hospital']
+}
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson; naive datetimes from Mongo are emitted as UTC"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open this worker's clients and indexes on startup and close the pools on shutdown"""
+    await create_clients(app)
+    await create_indexes()
+    yield
+    await close_clients(app)
+
 # Initialize FastAPI app
-app = FastAPI(title="Zark AI Knowledge Assistant API")
+app = FastAPI(title="Zark AI Knowledge Assistant API", default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -30,27 +94,267 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize MongoDB connection
+# MongoDB and HTTP clients are created per worker process in the lifespan hook,
+# so forked uvicorn workers never share a connection pool
 MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017/')
-client = MongoClient(MONGO_URL)
-db = client['knowledge_bot']
-knowledge_collection = db['knowledge']
-conversations_collection = db['conversations']
+MONGO_MAX_POOL_SIZE = 50
+MONGO_MIN_POOL_SIZE = 10
+MONGO_SERVER_SELECTION_TIMEOUT_MS = 3000
+client = None
+db = None
+knowledge_collection = None
+conversations_collection = None
+response_cache_collection = None
+ingest_jobs_collection = None
+kb_meta_collection = None
+
+# Chat responses persisted in Mongo so every worker (and restarts) can reuse them
+SHARED_CACHE_TTL_SECONDS = 24 * 3600
 
 # Initialize API Keys
 GROQ_API_KEY = os.environ.get('GROQ_API_KEY')
-if GROQ_API_KEY:
-    groq_client = Groq(api_key=GROQ_API_KEY)
+GROQ_MODEL = "llama3-70b-8192"
+
+groq_http_client = None
+groq_client = None
+
+# HTML parsing pool for large pages, started per worker at startup
+parse_pool = None
+
+# Semantic retrieval: needs sentence-transformers and an Atlas Vector Search index on "embedding"
+EMBEDDING_MODEL = os.environ.get('EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+VECTOR_SEARCH_INDEX = os.environ.get('VECTOR_SEARCH_INDEX')
+VECTOR_SEARCH_CANDIDATES = 100
+embedding_model = None
+
+async def create_clients(app: FastAPI):
+    """Open this worker's MongoDB and long-lived HTTP connection pools"""
+    global client, db, knowledge_collection, conversations_collection, response_cache_collection
+    global ingest_jobs_collection, kb_meta_collection
+    global groq_http_client, groq_client, parse_pool, embedding_model
+    
+    # Sized pool: warm connections for chat bursts, and fail fast when the server is unreachable
+    client = AsyncIOMotorClient(
+        MONGO_URL,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS
+    )
+    db = client['knowledge_bot']
+    knowledge_collection = db['knowledge']
+    conversations_collection = db['conversations']
+    response_cache_collection = db['semantic_cache']
+    ingest_jobs_collection = db['ingest_jobs']
+    kb_meta_collection = db['kb_meta']
+    llm_cache.shared = MongoCacheBackend(response_cache_collection)
+    
+    # Long-lived HTTP clients so connections (and TLS sessions) are reused across requests
+    groq_http_client = httpx.AsyncClient(
+        timeout=30.0,
+        limits=httpx.Limits(max_keepalive_connections=32),
+        http2=True
+    )
+    # Crawler pool shared by every ingestion; one client means one SSL context and keep-alive reuse
+    app.state.http = httpx.AsyncClient(
+        timeout=30.0,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        headers={"User-Agent": CRAWLER_USER_AGENT},
+        http2=True
+    )
+    
+    if GROQ_API_KEY:
+        groq_client = AsyncGroq(api_key=GROQ_API_KEY, http_client=groq_http_client)
+    
+    # Imported only when vector search is configured: it pulls in torch, which neither other
+    # workers nor the parse pool's children (they re-import this module) should pay for
+    if VECTOR_SEARCH_INDEX:
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:  # optional: semantic retrieval stays off without it
+            print("VECTOR_SEARCH_INDEX is set but sentence-transformers is not installed; vector search is off")
+        else:
+            embedding_model = SentenceTransformer(EMBEDDING_MODEL)
+    
+    # forkserver children start clean instead of forking this threaded process
+    if PARSE_WORKERS > 0:
+        parse_pool = ProcessPoolExecutor(
+            max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("forkserver")
+        )
+
+async def create_index_set(collection, models: List[IndexModel]) -> List[str]:
+    """Create each index on its own so one failing spec leaves the rest built; returns the failed names"""
+    failed = []
+    for model in models:
+        name = model.document["name"]
+        try:
+            await collection.create_indexes([model])
+        except Exception as e:
+            print(f"Index creation error on {collection.name}.{name}: {e}")
+            failed.append(name)
+    return failed
+
+async def create_indexes():
+    """Create the indexes backing knowledge base search, listing and upserts"""
+    failed = await create_index_set(knowledge_collection, [
+        IndexModel(
+            [("title", "text"), ("content", "text"), ("summary", "text"), ("tags", "text")],
+            weights={"title": 10, "summary": 5, "tags": 8, "content": 1},
+            name="kb_text"
+        ),
+        # Recency fallback sorts on its prefix; /api/knowledge is answered from it alone
+        IndexModel(
+            [("ingested_at", DESCENDING), ("title", 1), ("url", 1), ("summary", 1)],
+            name="kb_listing"
+        ),
+        # Upserts and the conditional-request lookup by url
+        IndexModel("url", unique=True),
+        IndexModel("search_tokens"),
+        IndexModel("tags")
+    ])
+    if "kb_text" in failed:
+        # Every $text search fails without it; search_knowledge logs each failure and moves on
+        print("ERROR: knowledge index kb_text is missing; every text search will fail and chat "
+              "answers come from keyword, prefix and recency matches only")
+    # Shared chat response cache: lookups by prompt hash, entries expire after a day
+    await create_index_set(response_cache_collection, [
+        IndexModel("key", unique=True),
+        IndexModel("ts", expireAfterSeconds=SHARED_CACHE_TTL_SECONDS)
+    ])
+    # Background ingestion jobs: polled by id from any worker, expired a day after they start
+    await create_index_set(ingest_jobs_collection, [
+        IndexModel("job_id", unique=True),
+        IndexModel("started_at", expireAfterSeconds=INGEST_JOB_TTL_SECONDS)
+    ])
+
+# Knowledge base size, read from collection metadata and kept current by this worker's
+# ingestion and clears; refreshed periodically to pick up other workers' writes
+KB_COUNT_REFRESH_SECONDS = 30
+kb_count = None
+kb_count_refreshed_at = 0.0
+
+async def get_kb_count(refresh: bool = False) -> int:
+    """Return the cached knowledge base size, re-reading collection metadata when stale"""
+    global kb_count, kb_count_refreshed_at
+    if (refresh or kb_count is None
+            or time.monotonic() - kb_count_refreshed_at > KB_COUNT_REFRESH_SECONDS):
+        kb_count = await knowledge_collection.estimated_document_count()
+        kb_count_refreshed_at = time.monotonic()
+    return kb_count
+
+def add_to_kb_count(delta: int):
+    global kb_count
+    if kb_count is not None:
+        kb_count = max(kb_count + delta, 0)
+
+# Knowledge-base generation: a counter in Mongo bumped on every change, so each worker
+# notices other workers' ingests and clears; this is the last value this worker saw
+kb_generation = None
+
+def clear_knowledge_caches():
+    """Drop this worker's caches and count derived from knowledge-base contents"""
+    global kb_count
+    response_cache.clear()
+    chat_cache.clear()
+    # Context keys are the query plus entry ids, which survive a re-crawl that changed the text
+    context_cache.clear()
+    kb_count = None
+
+async def bump_kb_generation():
+    """Record a knowledge-base change for every worker and drop this worker's caches"""
+    global kb_generation
+    clear_knowledge_caches()
+    try:
+        meta = await kb_meta_collection.find_one_and_update(
+            {"_id": "generation"}, {"$inc": {"value": 1}},
+            upsert=True, return_document=ReturnDocument.AFTER
+        )
+        kb_generation = meta["value"]
+    except Exception as e:
+        print(f"Knowledge generation update error: {e}")
+
+async def sync_kb_generation() -> Optional[int]:
+    """Read the shared generation, dropping local caches if another worker changed the knowledge base"""
+    global kb_generation
+    try:
+        meta = await kb_meta_collection.find_one({"_id": "generation"})
+    except Exception as e:
+        print(f"Knowledge generation read error: {e}")
+        return None
+    generation = meta["value"] if meta else 0
+    if generation != kb_generation:
+        clear_knowledge_caches()
+        kb_generation = generation
+    return generation
+
+async def close_clients(app: FastAPI):
+    """Close this worker's HTTP connection pools and MongoDB client"""
+    # Background crawls would otherwise outlive the clients they write through
+    for task in list(ingest_tasks):
+        task.cancel()
+    await asyncio.gather(*ingest_tasks, return_exceptions=True)
+    await app.state.http.aclose()
+    await groq_http_client.aclose()
+    if parse_pool is not None:
+        parse_pool.shutdown(cancel_futures=True)
+    client.close()
+
+# Chat responses depend on the knowledge base, so this cache is cleared whenever it changes,
+# here or (through kb_generation) on another worker
+response_cache = ResponseCache(maxsize=10000, ttl=3600)
+# Shared Mongo tier is attached once the database client exists
+llm_cache = LLMCache(response_cache)
+# Finished /api/chat answers keyed on the normalized query; a hit skips search and the prompt
+chat_cache = ResponseCache(maxsize=2048, ttl=900)
+summary_cache = ResponseCache(maxsize=10000, ttl=3600)
+# Pure-function memoization: page metadata keyed on a hash of the text, contexts on doc ids + query
+extraction_cache = ResponseCache(maxsize=2048, ttl=3600)
+context_cache = ResponseCache(maxsize=2048, ttl=3600)
+
+# Background ingestion jobs live in Mongo so a poll can land on any worker;
+# this worker keeps strong references to the tasks it is running
+INGEST_JOB_TTL_SECONDS = 24 * 3600
+INGEST_PROGRESS_INTERVAL = 1.0  # seconds between progress writes while a job runs
+ingest_tasks = set()
+
+# Crawler settings
+CRAWLER_USER_AGENT = os.environ.get('CRAWLER_USER_AGENT', 'ZarkBot/2.0 (+knowledge ingestion)')
+PARSE_WORKERS = int(os.environ.get('PARSE_WORKERS', '2'))  # 0 parses every page on the event loop
+PARSE_OFFLOAD_BYTES = 64 * 1024  # smaller pages are parsed inline
+CRAWL_WORKERS = 16  # concurrent page fetches per ingestion, well under the crawler pool size
+MAX_CRAWL_PAGES = 50
+CONTENT_MAX_CHARS = 8000  # stored content size; metadata is extracted from the same text
+RAW_TEXT_MAX_CHARS = CONTENT_MAX_CHARS * 4  # headroom for whitespace removed by collapsing
+# Page upserts per bulk_write, a fraction of the page cap so long crawls flush (and report
+# pages_ingested) as they go; the remainder is flushed when the crawl ends
+BULK_WRITE_BATCH = max(MAX_CRAWL_PAGES // 5, 1)
+MAX_PAGE_BYTES = 512 * 1024  # HTML read per page; the rest of the download is abandoned
+
+# Summary micro-batching settings
+SUMMARY_BATCH_MAX = 8
+SUMMARY_BATCH_TIMEOUT = 0.05  # seconds
+SUMMARY_CONCURRENCY = 4  # batched Groq summary calls in flight at once
+
+# Short pages are summarized locally instead of with a Groq round-trip
+EXTRACTIVE_SUMMARY_MAX_CHARS = 800
+EXTRACTIVE_SUMMARY_MIN_SENTENCES = 5
+LLM_SUMMARY_MIN_WORDS = 80
+LLM_SUMMARY_MIN_UNIQUE_RATIO = 0.3  # distinct/total words; lower reads as boilerplate
+EXTRACTIVE_SUMMARY_SENTENCES = 3
+SUMMARY_PASSTHROUGH_CHARS = 400  # below this the page text is its own summary
+SUMMARY_FALLBACK_CHARS = 300  # leading text kept when a page has too few sentences to pick from
 
 # Pydantic models
 class QueryRequest(BaseModel):
     query: str
     conversation_id: Optional[str] = None
     show_sources: bool = False  # New field to control source display
+    stream: bool = False  # Stream the response text as it is generated
 
 class UrlIngestRequest(BaseModel):
     url: str
     depth: int = 1
+    max_pages: int = Field(default=MAX_CRAWL_PAGES, ge=1, le=MAX_CRAWL_PAGES)
+    background: bool = False  # Return 202 with a job id immediately instead of waiting for the crawl
 
 class ChatResponse(BaseModel):
     response: str
@@ -73,7 +377,7 @@ async def root():
 async def health_check():
     try:
         # Check MongoDB connection
-        db.command('ping')
+        await db.command('ping')
         
         # Check Groq API
         if not GROQ_API_KEY:
@@ -87,10 +391,11 @@ async def health_check():
 async def get_help():
     """Get help information about how Zark-AI works"""
     try:
-        total_entries = knowledge_collection.count_documents({})
+        total_entries = await get_kb_count()
         api_status = "configured" if GROQ_API_KEY else "not_configured"
         
-        return {
+        # Large nested literal of plain types, so skip jsonable_encoder's recursive walk
+        return ORJSONResponse({
             "bot_name": "Zark-AI",
             "version": "2.0",
             "api_status": api_status,
@@ -134,7 +439,7 @@ async def get_help():
                     "Bot status will show 'Online' when properly configured"
                 ]
             }
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting help: {str(e)}")
 
@@ -142,13 +447,15 @@ async def get_help():
 async def get_detailed_status():
     """Get detailed status information"""
     try:
-        total_entries = knowledge_collection.count_documents({})
-        recent_entries = list(knowledge_collection.find(
+        # Collection metadata rather than a count scan; also refreshes the cached count
+        total_entries = await get_kb_count(refresh=True)
+        recent_entries = await knowledge_collection.find(
             {}, 
             {"title": 1, "url": 1, "ingested_at": 1, "_id": 0}
-        ).sort("ingested_at", -1).limit(5))
+        ).sort("ingested_at", -1).limit(5).to_list(length=5)
         
-        return {
+        # Returned directly so orjson serializes the datetimes without jsonable_encoder
+        return ORJSONResponse({
             "status": "healthy" if GROQ_API_KEY else "limited",
             "api_configured": bool(GROQ_API_KEY),
             "mongodb_connected": True,
@@ -157,7 +464,7 @@ async def get_detailed_status():
                 "recent_entries": recent_entries
             },
             "capabilities": "full" if GROQ_API_KEY else "limited"
-        }
+        })
     except Exception as e:
         return {
             "status": "error",
@@ -166,250 +473,486 @@ async def get_detailed_status():
             "mongodb_connected": False
         }
 
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """Get hit/miss statistics for the LLM response caches"""
+    return {
+        "chat_cache": chat_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "summary_cache": summary_cache.stats()
+    }
+
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat_query(request: QueryRequest):
+async def chat_query(request: QueryRequest, background_tasks: BackgroundTasks,
+                     accept: Optional[str] = Header(default=None)):
     try:
         print(f"Chat request: query='{request.query}', show_sources={request.show_sources}")
         
+        # EventSource-style clients ask for SSE through the Accept header instead of the body
+        if accept and "text/event-stream" in accept:
+            request.stream = True
+        
         # Generate conversation ID if not provided
         conversation_id = request.conversation_id or str(uuid.uuid4())
         
+        # Repeated identical questions are answered from memory before any search or LLM work;
+        # the generation in the key keeps answers from before any worker's ingest or clear out
+        generation = await sync_kb_generation()
+        chat_key = None
+        if generation is not None:
+            chat_key = ResponseCache.make_key(str(generation), request.query.strip().lower(), str(request.show_sources))
+            cached_chat = chat_cache.get(chat_key)
+            if cached_chat is not None:
+                return answer_from_chat_cache(cached_chat, request, conversation_id, background_tasks)
+        
+        # Knowledge count is read once (usually from memory) and shared by search and context
+        total_count = await get_kb_count()
+        
         # Search knowledge base
-        relevant_knowledge = await search_knowledge(request.query)
+        relevant_knowledge = await search_knowledge(request.query, total_count=total_count)
         print(f"Found {len(relevant_knowledge)} relevant knowledge entries")
         
-        # Prepare context for AI response
-        context = prepare_context(relevant_knowledge, request.query)
+        # Prepare context for AI response; pure CPU once the count is known
+        context = prepare_context(relevant_knowledge, request.query, total_count)
         
-        # Generate response using Groq
-        response = await generate_ai_response(context, request.query, request.show_sources)
-        
-        # Extract sources from relevant knowledge
-        sources = []
-        if request.show_sources and relevant_knowledge:
-            for k in relevant_knowledge:
-                url = k.get("url", "")
-                title = k.get("title", "Unknown Source")
-                if url:
-                    sources.append(f"{title}: {url}")
+        # Extract sources from relevant knowledge once; the same list is stored and returned
+        sources = [
+            f"{k.get('title', 'Unknown Source')}: {k['url']}"
+            for k in relevant_knowledge if k.get("url")
+        ] if request.show_sources else []
         
         print(f"Returning {len(sources)} sources")
         
-        # Store conversation
+        # Filled in by the generator so stored conversations record whether the cache answered;
+        # "cacheable" is only set for real model answers, never offline or error text
+        response_meta = {"cache_hit": False, "cacheable": False}
+        
+        if request.stream:
+            # Stream tokens as Groq produces them; the conversation is stored once the stream ends
+            parts = []
+            
+            async def stream_response():
+                # Server-sent events: one JSON "delta" per chunk, then a final "done" event
+                async for chunk in stream_ai_response(context, request.query, request.show_sources, response_meta):
+                    parts.append(chunk)
+                    yield b"data: " + orjson.dumps({"delta": chunk}) + b"\n\n"
+                if response_meta["cacheable"] and chat_key is not None:
+                    chat_cache.set(chat_key, ("".join(parts), sources))
+                done = {"conversation_id": conversation_id, "sources": sources, "cache_hit": response_meta["cache_hit"]}
+                yield b"event: done\ndata: " + orjson.dumps(done) + b"\n\n"
+            
+            conversation_entry = {
+                "id": conversation_id,
+                "query": request.query,
+                "sources": sources,
+                "timestamp": datetime.utcnow()
+            }
+            background_tasks.add_task(store_conversation, conversation_entry, parts, response_meta)
+            return StreamingResponse(
+                stream_response(),
+                media_type="text/event-stream",
+                headers={"X-Conversation-Id": conversation_id, "X-Sources": json.dumps(sources)}
+            )
+        
+        # Generate response using Groq
+        response = await generate_ai_response(context, request.query, request.show_sources, response_meta)
+        if response_meta["cacheable"] and chat_key is not None:
+            chat_cache.set(chat_key, (response, sources))
+        
+        # Store conversation after the response is sent
         conversation_entry = {
             "id": conversation_id,
             "query": request.query,
             "response": response,
             "sources": sources,
+            "cache_hit": response_meta["cache_hit"],
             "timestamp": datetime.utcnow()
         }
-        conversations_collection.insert_one(conversation_entry)
+        background_tasks.add_task(store_conversation, conversation_entry)
         
-        return ChatResponse(
-            response=response,
-            sources=sources,
-            conversation_id=conversation_id
-        )
+        # Plain strings only, so skip jsonable_encoder and serialize straight to bytes
+        return ORJSONResponse({
+            "response": response,
+            "sources": sources,
+            "conversation_id": conversation_id
+        })
     except Exception as e:
         print(f"Chat error: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
+def answer_from_chat_cache(cached_chat: tuple, request: QueryRequest, conversation_id: str,
+                           background_tasks: BackgroundTasks):
+    """Replay a cached chat answer in the format the request asked for"""
+    response, sources = cached_chat
+    print(f"Chat cache hit for query='{request.query}'")
+    conversation_entry = {
+        "id": conversation_id,
+        "query": request.query,
+        "response": response,
+        "sources": sources,
+        "cache_hit": True,
+        "timestamp": datetime.utcnow()
+    }
+    background_tasks.add_task(store_conversation, conversation_entry)
+    
+    if request.stream:
+        async def stream_response():
+            yield b"data: " + orjson.dumps({"delta": response}) + b"\n\n"
+            done = {"conversation_id": conversation_id, "sources": sources, "cache_hit": True}
+            yield b"event: done\ndata: " + orjson.dumps(done) + b"\n\n"
+        
+        return StreamingResponse(
+            stream_response(),
+            media_type="text/event-stream",
+            headers={"X-Conversation-Id": conversation_id, "X-Sources": json.dumps(sources)}
+        )
+    
+    return ORJSONResponse({
+        "response": response,
+        "sources": sources,
+        "conversation_id": conversation_id
+    })
+
+async def store_conversation(conversation_entry: Dict, response_parts: Optional[List[str]] = None,
+                             response_meta: Optional[Dict] = None):
+    """Persist a chat exchange; streamed responses are joined from their parts"""
+    try:
+        if response_parts is not None:
+            conversation_entry["response"] = "".join(response_parts)
+        if response_meta is not None:
+            conversation_entry["cache_hit"] = response_meta["cache_hit"]
+        await conversations_collection.insert_one(conversation_entry)
+    except Exception as e:
+        print(f"Conversation store error: {e}")
+
+async def run_ingestion(request: UrlIngestRequest, progress: Optional[Dict] = None) -> tuple:
+    """Crawl a URL into the knowledge base; returns the result payload and pages awaiting LLM summaries"""
+    print(f"Starting ingestion for URL: {request.url}")
+    pending_summaries = []
+    ingested_count = await ingest_from_url(
+        request.url, request.depth, app.state.http, request.max_pages, pending_summaries, progress
+    )
+    await bump_kb_generation()
+    
+    total_entries = await get_kb_count()
+    print(f"Total entries in knowledge base after ingestion: {total_entries}")
+    
+    return {
+        "message": f"Successfully ingested {ingested_count} pages from {request.url}",
+        "url": request.url,
+        "total_entries": total_entries
+    }, pending_summaries
+
+async def save_ingest_job(job: Dict):
+    """Write a job's progress and outcome to the ingest_jobs collection"""
+    try:
+        fields = {key: value for key, value in job.items() if key != "job_id"}
+        await ingest_jobs_collection.update_one({"job_id": job["job_id"]}, {"$set": fields}, upsert=True)
+    except Exception as e:
+        print(f"Ingestion job store error: {e}")
+
+# Counters ingest_from_url updates on a running job
+INGEST_PROGRESS_FIELDS = ("pages_scheduled", "pages_crawled", "pages_ingested")
+
+async def publish_ingest_progress(job: Dict):
+    """Periodically persist a running job's counters"""
+    while True:
+        await asyncio.sleep(INGEST_PROGRESS_INTERVAL)
+        try:
+            # Matches only while running, so a write that lands after the final save is a no-op
+            await ingest_jobs_collection.update_one(
+                {"job_id": job["job_id"], "status": "running"},
+                {"$set": {field: job[field] for field in INGEST_PROGRESS_FIELDS}}
+            )
+        except Exception as e:
+            print(f"Ingestion progress store error: {e}")
+
+async def run_ingest_job(job: Dict, request: UrlIngestRequest):
+    """Run a background ingestion, recording progress and the outcome on its job"""
+    publisher = asyncio.create_task(publish_ingest_progress(job))
+    try:
+        result, pending_summaries = await run_ingestion(request, job)
+        job.update(result, status="completed", finished_at=datetime.utcnow())
+    except Exception as e:
+        print(f"Ingestion job error: {e}")
+        job.update(status="failed", error=str(e), finished_at=datetime.utcnow())
+        pending_summaries = []
+    finally:
+        publisher.cancel()
+        await asyncio.gather(publisher, return_exceptions=True)
+    await save_ingest_job(job)
+    
+    # Same deferred LLM summaries as the synchronous path, after the job reports done
+    if pending_summaries:
+        await refresh_summaries(pending_summaries)
+
 @app.post("/api/ingest")
-async def ingest_content(request: UrlIngestRequest):
+async def ingest_content(request: UrlIngestRequest, background_tasks: BackgroundTasks):
     try:
-        print(f"Starting ingestion for URL: {request.url}")
-        ingested_count = await ingest_from_url(request.url, request.depth)
+        if request.background:
+            # Crawl outside the request; clients poll the returned status URL
+            job_id = str(uuid.uuid4())
+            job = {
+                "job_id": job_id,
+                "url": request.url,
+                "status": "running",
+                "pages_scheduled": 0,
+                "pages_crawled": 0,
+                "pages_ingested": 0,
+                "started_at": datetime.utcnow()
+            }
+            await save_ingest_job(job)
+            task = asyncio.create_task(run_ingest_job(job, request))
+            ingest_tasks.add(task)
+            task.add_done_callback(ingest_tasks.discard)
+            return ORJSONResponse(
+                {"job_id": job_id, "status": "running", "status_url": f"/api/ingest/{job_id}"},
+                status_code=202
+            )
         
-        # Verify the content was actually stored
-        total_entries = knowledge_collection.count_documents({})
-        print(f"Total entries in knowledge base after ingestion: {total_entries}")
+        result, pending_summaries = await run_ingestion(request)
         
-        return {
-            "message": f"Successfully ingested {ingested_count} pages from {request.url}",
-            "url": request.url,
-            "total_entries": total_entries
-        }
+        # Groq summaries are generated after the response is sent
+        if pending_summaries:
+            background_tasks.add_task(refresh_summaries, pending_summaries)
+        
+        return ORJSONResponse(result)
     except Exception as e:
         print(f"Ingestion error: {e}")
         raise HTTPException(status_code=500, detail=f"Error ingesting content: {str(e)}")
 
+@app.get("/api/ingest/{job_id}")
+async def get_ingest_job(job_id: str):
+    """Get progress or the outcome of a background ingestion"""
+    try:
+        job = await ingest_jobs_collection.find_one({"job_id": job_id}, {"_id": 0})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving ingestion job: {str(e)}")
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ingestion job: {job_id}")
+    return ORJSONResponse(job)
+
 @app.get("/api/knowledge")
 async def get_knowledge():
     try:
-        # Get total count
-        total_count = knowledge_collection.count_documents({})
+        # Get total count from collection metadata, refreshing the cached count
+        total_count = await get_kb_count(refresh=True)
         
         # Get recent entries with more details
-        knowledge = list(knowledge_collection.find(
+        # Covered by the kb_listing index: scalar fields only, so no documents are fetched
+        knowledge = await knowledge_collection.find(
             {},
-            {"_id": 0, "content": 0}  # Exclude large content field for overview
-        ).sort("ingested_at", -1).limit(10))
+            {"_id": 0, "title": 1, "url": 1, "summary": 1, "ingested_at": 1}
+        ).sort("ingested_at", -1).limit(10).to_list(length=10)
         
-        return {
+        # Returned directly so orjson serializes the datetimes without jsonable_encoder
+        return ORJSONResponse({
             "knowledge": knowledge,
             "total": total_count,
             "recent_count": len(knowledge)
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving knowledge: {str(e)}")
 
+@app.get("/api/knowledge/count")
+async def get_knowledge_count():
+    """Knowledge-base size alone, for callers polling ingestion progress"""
+    try:
+        return {"total": await get_kb_count(refresh=True)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error counting knowledge: {str(e)}")
+
 @app.delete("/api/knowledge")
 async def clear_knowledge():
     try:
-        result = knowledge_collection.delete_many({})
-        return {"message": f"Cleared {result.deleted_count} knowledge entries"}
+        result = await knowledge_collection.delete_many({})
+        await bump_kb_generation()
+        # Read back rather than assumed, so callers can verify the clear took effect
+        total_count = await get_kb_count(refresh=True)
+        return {"message": f"Cleared {result.deleted_count} knowledge entries", "total": total_count}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error clearing knowledge: {str(e)}")
 
-async def search_knowledge(query: str, limit: int = 5) -> List[Dict]:
-    """Enhanced search knowledge base using multiple search strategies"""
+# Only the fields prepare_context and the sources list read; crawl metadata stays in Mongo
+SEARCH_PROJECTION = {"_id": 0, "id": 1, "title": 1, "url": 1, "summary": 1, "tags": 1, "content": 1}
+
+async def embed_texts(texts: List[str]) -> List[List[float]]:
+    """Encode texts to unit-length vectors off the event loop"""
+    vectors = await asyncio.get_running_loop().run_in_executor(
+        None, lambda: embedding_model.encode(texts, normalize_embeddings=True)
+    )
+    return vectors.tolist()
+
+async def vector_search(query: str, limit: int) -> List[Dict]:
+    """Nearest knowledge entries to the query embedding via Atlas $vectorSearch"""
     try:
-        # Get total count first
-        total_count = knowledge_collection.count_documents({})
+        query_vector = (await embed_texts([query]))[0]
+        return await knowledge_collection.aggregate([
+            {"$vectorSearch": {
+                "index": VECTOR_SEARCH_INDEX,
+                "path": "embedding",
+                "queryVector": query_vector,
+                "numCandidates": VECTOR_SEARCH_CANDIDATES,
+                "limit": limit
+            }},
+            {"$project": {**SEARCH_PROJECTION, "score": {"$meta": "vectorSearchScore"}}}
+        ]).to_list(length=limit)
+    except Exception as e:
+        print(f"Vector search error: {e}")
+        return []
+
+async def search_knowledge(query: str, limit: int = 5, total_count: Optional[int] = None) -> List[Dict]:
+    """Search knowledge base: vector search when configured, else the weighted text index, topped up by prefixes; then keyword tokens and prefixes, then recent entries"""
+    try:
+        # Cached knowledge base size; no collection scan on the chat path
+        if total_count is None:
+            total_count = await get_kb_count()
         print(f"Total knowledge entries: {total_count}")
         
-        # Split query into words for better matching
-        query_words = [word.lower() for word in query.split() if len(word) > 2]
-        
-        # Create multiple search strategies
-        search_conditions = []
-        
-        # Strategy 1: Exact phrase search
-        search_conditions.extend([
-            {"title": {"$regex": query, "$options": "i"}},
-            {"content": {"$regex": query, "$options": "i"}},
-            {"summary": {"$regex": query, "$options": "i"}}
-        ])
-        
-        # Strategy 2: Individual word search with higher priority on title/summary
-        for word in query_words:
-            search_conditions.extend([
-                {"title": {"$regex": word, "$options": "i"}},
-                {"summary": {"$regex": word, "$options": "i"}},
-                {"keywords": {"$in": [word]}},
-                {"tags": {"$in": [word]}},
-                {"entities": {"$in": [word.title()]}},
-                {"content": {"$regex": word, "$options": "i"}}
-            ])
+        # Plain terms only: quotes would turn the query into a phrase match verified against
+        # every candidate document, and a leading hyphen would negate a term
+        text_query = " ".join(_RE_TOKEN.findall(query))
         
-        # Strategy 3: Domain-specific search
-        if "what is" in query.lower() or "tell me about" in query.lower():
-            # Extract the main topic
-            topic_match = re.search(r'(?:what is|tell me about|explain)\s+(.+?)(?:\?|$)', query.lower())
-            if topic_match:
-                topic = topic_match.group(1).strip()
-                search_conditions.extend([
-                    {"title": {"$regex": topic, "$options": "i"}},
-                    {"tags": {"$in": [topic]}},
-                    {"keywords": {"$in": [topic]}}
-                ])
-        
-        # Perform search with different strategies
+        # Semantic match first when configured, so "AI" also finds "artificial intelligence"
         results = []
+        if embedding_model is not None:
+            results = await vector_search(query, limit)
+            print(f"Vector search for '{query}' returned {len(results)} results")
         
-        if search_conditions:
-            # Primary search
-            search_results = knowledge_collection.find(
-                {"$or": search_conditions},
-                {"_id": 0}
-            ).sort("ingested_at", -1).limit(limit)
-            results = list(search_results)
+        # Single indexed text search ranked by relevance score
+        if not results:
+            try:
+                results = await knowledge_collection.find(
+                    {"$text": {"$search": text_query}},
+                    {**SEARCH_PROJECTION, "score": {"$meta": "textScore"}}
+                ).sort([("score", {"$meta": "textScore"})]).to_list(length=limit)
+                
+                print(f"Text search for '{query}' returned {len(results)} results")
+            except Exception as e:
+                # Missing kb_text index or a bad query: the fallback tiers below still answer
+                print(f"Text search error: {e}")
+                results = []
         
-        print(f"Primary search for '{query}' returned {len(results)} results")
+        # Tokenize the query the same way extract_keywords tokenizes content
+        # Distinct, non-stop-word tokens, capped so the fallback queries stay small
+        tokens = list(dict.fromkeys(
+            word for word in _RE_WORD3.findall(query.lower()) if word not in _STOP_WORDS
+        ))[:MAX_QUERY_TOKENS]
+        
+        # Anchored, case-sensitive prefixes so the lowercase multikey indexes bound the scan;
+        # they catch partial words that the stemmed, whole-word text index misses
+        prefix_clauses = []
+        for token in tokens:
+            prefix = f"^{re.escape(token)}"
+            prefix_clauses.append({"search_tokens": {"$regex": prefix}})
+            prefix_clauses.append({"tags": {"$regex": prefix}})
+        
+        # Text then refine: top up a short ranked list with prefix matches it does not already hold
+        if results and len(results) < limit and prefix_clauses:
+            found_ids = [item["id"] for item in results if item.get("id")]
+            extra = await knowledge_collection.find(
+                {"$or": prefix_clauses, "id": {"$nin": found_ids}},
+                SEARCH_PROJECTION
+            ).limit(limit - len(results)).to_list(length=limit - len(results))
+            if extra:
+                print(f"Prefix search added {len(extra)} results")
+                results.extend(extra)
         
-        # If no results, try fallback searches
         if not results and total_count > 0:
-            print("No primary matches found, trying fallback searches...")
-            
-            # Fallback 1: Partial word matching
-            fallback_conditions = []
-            for word in query_words:
-                if len(word) > 3:
-                    fallback_conditions.extend([
-                        {"title": {"$regex": f".*{word}.*", "$options": "i"}},
-                        {"content": {"$regex": f".*{word}.*", "$options": "i"}}
-                    ])
+            # The fallbacks run as one concurrent round instead of up to three sequential
+            # round-trips. They cannot share a $facet: $text must lead its own pipeline and
+            # facet sub-pipelines cannot use indexes.
+            fallbacks = {}
+            if tokens:
+                # Literal keyword match against the multikey search_tokens index
+                fallbacks["Keyword search"] = knowledge_collection.find(
+                    {"search_tokens": {"$in": tokens}},
+                    SEARCH_PROJECTION
+                ).limit(limit).to_list(length=limit)
+                
+                fallbacks["Prefix search"] = knowledge_collection.find(
+                    {"$or": prefix_clauses},
+                    SEARCH_PROJECTION
+                ).limit(limit).to_list(length=limit)
             
-            if fallback_conditions:
-                search_results = knowledge_collection.find(
-                    {"$or": fallback_conditions},
-                    {"_id": 0}
-                ).limit(limit)
-                results = list(search_results)
-                print(f"Fallback search returned {len(results)} results")
-        
-        # If still no results, return recent entries
-        if not results and total_count > 0:
-            print("No specific matches found, returning recent entries")
-            search_results = knowledge_collection.find(
+            # If no results, return recent entries
+            fallbacks["Recent entries"] = knowledge_collection.find(
                 {},
-                {"_id": 0}
-            ).sort("ingested_at", -1).limit(limit)
-            results = list(search_results)
-            print(f"Returning {len(results)} recent entries")
+                SEARCH_PROJECTION
+            ).sort("ingested_at", -1).limit(limit).to_list(length=limit)
+            
+            # First non-empty tier wins, in priority order
+            for name, found in zip(fallbacks, await asyncio.gather(*fallbacks.values())):
+                if found:
+                    results = found
+                    print(f"{name} returned {len(results)} results")
+                    break
         
         return results
     except Exception as e:
         print(f"Search error: {e}")
         return []
 
-def prepare_context(knowledge: List[Dict], query: str) -> str:
+def prepare_context(knowledge: List[Dict], query: str, total_count: int) -> str:
     """Prepare enhanced context from knowledge base for AI response"""
-    # Get total knowledge count
-    total_count = knowledge_collection.count_documents({})
-    
     if not knowledge:
         if total_count > 0:
             return f"Query: {query}\n\nI have access to {total_count} knowledge entries in my database, but none directly match your specific query. I'll provide a response based on my general knowledge and training data."
         else:
             return f"Query: {query}\n\nNo knowledge entries found in the database. I'll provide a response based on my general knowledge and training data."
     
+    # Same documents for the same query always produce the same context
+    cache_key = ResponseCache.make_key(query, *(str(item.get('id') or item.get('url')) for item in knowledge))
+    cached = context_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    # One case-insensitive alternation of the query words, matched as substrings like before
+    query_words = [word for word in query.lower().split() if len(word) > 2]
+    query_pattern = re.compile("|".join(map(re.escape, query_words)), re.IGNORECASE) if query_words else None
+    
     # Check if we have relevant knowledge
-    context = f"Query: {query}\n\n"
-    context += f"I have access to {total_count} total knowledge entries. Here are the most relevant ones for your question:\n"
+    # Pieces are collected in a list and joined once rather than re-copying the growing string
+    parts = [f"Query: {query}\n\n", "Here are the most relevant knowledge entries for your question:\n"]
     
     for i, item in enumerate(knowledge, 1):
-        context += f"\n--- Source {i}: {item.get('title', 'Unknown')} ---\n"
-        context += f"URL: {item.get('url', 'Unknown')}\n"
+        parts.append(f"\n--- Source {i}: {item.get('title', 'Unknown')} ---\n")
+        parts.append(f"URL: {item.get('url', 'Unknown')}\n")
         
         # Include summary if available
         if item.get('summary'):
-            context += f"Summary: {item.get('summary', '')}\n"
+            parts.append(f"Summary: {item.get('summary', '')}\n")
         
         # Include relevant content sections
         content = item.get('content', '')
         if content:
             # Try to find the most relevant part of the content for the query
-            query_words = query.lower().split()
-            content_lower = content.lower()
-            
             # Find sentences that contain query words
-            sentences = content.split('. ')
             relevant_sentences = []
-            for sentence in sentences:
-                if any(word in sentence.lower() for word in query_words if len(word) > 2):
-                    relevant_sentences.append(sentence.strip())
-                    if len(relevant_sentences) >= 3:  # Limit to 3 most relevant sentences
-                        break
+            if query_pattern is not None:
+                for sentence in content.split('. '):
+                    if query_pattern.search(sentence):
+                        relevant_sentences.append(sentence.strip())
+                        if len(relevant_sentences) >= 3:  # Limit to 3 most relevant sentences
+                            break
             
             if relevant_sentences:
-                context += f"Relevant Content: {'. '.join(relevant_sentences)}\n"
+                parts.append(f"Relevant Content: {'. '.join(relevant_sentences)}\n")
             else:
-                context += f"Content: {content[:800]}...\n"
+                parts.append(f"Content: {content[:800]}...\n")
         
         # Include tags if available
         if item.get('tags'):
-            context += f"Tags: {', '.join(item.get('tags', [])[:5])}\n"
+            parts.append(f"Tags: {', '.join(item.get('tags', [])[:5])}\n")
+    
+    parts.append("\nBased on the above information from my knowledge base, please provide a comprehensive and accurate answer to the user's question. If the information directly answers their question, prioritize that content. If they're asking for specific details about the website content, reference the relevant sections.")
     
-    context += "\nBased on the above information from my knowledge base, please provide a comprehensive and accurate answer to the user's question. If the information directly answers their question, prioritize that content. If they're asking for specific details about the website content, reference the relevant sections."
+    context = "".join(parts)
     
+    context_cache.set(cache_key, context)
     return context
 
-async def generate_ai_response(context: str, query: str, show_sources: bool = False) -> str:
-    """Generate AI response using Groq with enhanced error handling"""
-    try:
-        if not GROQ_API_KEY:
-            return """🔴 **OFFLINE MODE**: I'm currently running in offline mode because the Groq API key is not configured. 
+OFFLINE_RESPONSE = """🔴 **OFFLINE MODE**: I'm currently running in offline mode because the Groq API key is not configured. 
             
 **How Zark-AI Works:**
 
@@ -431,20 +974,19 @@ async def generate_ai_response(context: str, query: str, show_sources: bool = Fa
 3. Restart the backend service
 
 **Current Query**: I cannot properly answer your question about: "{query}" in offline mode."""
-        
-        # Check if user is asking for sources
-        wants_sources = show_sources or any(phrase in query.lower() for phrase in [
-            "source", "sources", "where did you get", "reference", "link", "url", "website", "citation", "cite"
-        ])
-        
-        # Check if user is asking for more details
-        is_detailed_request = any(phrase in query.lower() for phrase in [
-            "more details", "more information", "explain further", "tell me more", 
-            "elaborate", "expand", "comprehensive", "detailed", "in depth"
-        ])
-        
-        # Enhanced system prompt to make Zark more conversational and helpful
-        system_prompt = """You are Zark, a friendly and intelligent AI assistant. You have access to a comprehensive knowledge database and can answer questions on a wide variety of topics.
+
+# Phrases that switch the chat prompt into source-citing or detailed mode
+SOURCE_PHRASES = (
+    "source", "sources", "where did you get", "reference", "link", "url", "website", "citation", "cite"
+)
+DETAIL_PHRASES = (
+    "more details", "more information", "explain further", "tell me more",
+    "elaborate", "expand", "comprehensive", "detailed", "in depth"
+)
+
+# Enhanced system prompt to make Zark more conversational and helpful; kept byte-identical
+# and sent once, as the leading system message, so the provider can reuse the cached prefix
+CHAT_SYSTEM_PROMPT = """You are Zark, a friendly and intelligent AI assistant. You have access to a comprehensive knowledge database and can answer questions on a wide variety of topics.
 
 Your personality:
 - Friendly, approachable, and helpful
@@ -467,48 +1009,46 @@ Instructions:
 - Be conversational and engaging in your responses
 - Don't mention technical details about your knowledge database unless specifically asked"""
 
-        if wants_sources:
-            if is_detailed_request:
-                prompt = f"""{system_prompt}
+SUMMARY_SYSTEM_PROMPT = "You are a helpful AI assistant that creates concise, informative summaries."
 
-{context}
+def build_chat_prompt(context: str, query: str, show_sources: bool = False) -> tuple:
+    """Build the (system prompt, user prompt, cache namespace or None) for a chat query"""
+    query_lower = query.lower()
+    
+    # Check if user is asking for sources
+    wants_sources = show_sources or any(phrase in query_lower for phrase in SOURCE_PHRASES)
+    
+    # Check if user is asking for more details
+    is_detailed_request = any(phrase in query_lower for phrase in DETAIL_PHRASES)
+    
+    if wants_sources:
+        if is_detailed_request:
+            prompt = f"""{context}
 
 The user is asking for detailed information and wants to know about sources. Provide a comprehensive, accurate response using the provided context. When you have information from the knowledge database, mention where it came from naturally in your response."""
-            else:
-                prompt = f"""{system_prompt}
-
-{context}
-
-The user wants to know about sources. Provide a clear, informative response using the provided context. When you reference information from the knowledge database, acknowledge where it came from."""
         else:
-            if is_detailed_request:
-                prompt = f"""{system_prompt}
+            prompt = f"""{context}
 
-{context}
+The user wants to know about sources. Provide a clear, informative response using the provided context. When you reference information from the knowledge database, acknowledge where it came from."""
+    else:
+        if is_detailed_request:
+            prompt = f"""{context}
 
 The user is asking for detailed information. Provide a comprehensive, accurate response using the provided context. Focus on being thorough and informative."""
-            else:
-                prompt = f"""{system_prompt}
-
-{context}
+        else:
+            prompt = f"""{context}
 
 Provide a clear, helpful, and engaging response. Use the provided context when relevant, but focus on being conversational and informative."""
 
-        response = groq_client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ],
-            model="llama3-70b-8192",
-            max_tokens=1024,
-            temperature=0.7
-        )
-        
-        return response.choices[0].message.content
-    except Exception as e:
-        error_message = str(e)
-        if "api" in error_message.lower() or "key" in error_message.lower():
-            return f"""🔴 **API ERROR**: There's an issue with the AI service connection. 
+    # Detailed answers are meant to vary, so they are never served from or stored in the cache
+    cache_namespace = None if is_detailed_request else f"{wants_sources}:{is_detailed_request}"
+    return CHAT_SYSTEM_PROMPT, prompt, cache_namespace
+
+def format_ai_error(e: Exception, query: str) -> str:
+    """Turn a Groq failure into a user-facing message"""
+    error_message = str(e)
+    if "api" in error_message.lower() or "key" in error_message.lower():
+        return f"""🔴 **API ERROR**: There's an issue with the AI service connection. 
 
 **Error Details**: {error_message}
 
@@ -524,200 +1064,666 @@ Provide a clear, helpful, and engaging response. Use the provided context when r
 
 **Your Question**: "{query}"
 I cannot provide a proper AI-generated response due to the API issue above."""
-        else:
-            return f"⚠️ **Processing Error**: I encountered an error while processing your question: {error_message}. Please try rephrasing your question or try again later."
+    else:
+        return f"⚠️ **Processing Error**: I encountered an error while processing your question: {error_message}. Please try rephrasing your question or try again later."
+
+async def get_cached_response(prompt: str, cache_namespace: Optional[str]) -> tuple:
+    """Look up a chat response in the local, then shared Mongo cache tier"""
+    cache_key = ResponseCache.make_key(CHAT_SYSTEM_PROMPT, prompt, GROQ_MODEL)
+    if cache_namespace is None:
+        return cache_key, None
+    return cache_key, await llm_cache.get(cache_key)
+
+async def store_cached_response(cache_key: str, query: str, cache_namespace: Optional[str], content: str):
+    """Cache a chat response; the shared tier records the query beside it for inspection only"""
+    if cache_namespace is not None:
+        await llm_cache.set(cache_key, query, content)
+
+async def generate_ai_response(context: str, query: str, show_sources: bool = False,
+                               response_meta: Optional[Dict] = None) -> str:
+    """Generate AI response using Groq with enhanced error handling"""
+    try:
+        if not GROQ_API_KEY:
+            return OFFLINE_RESPONSE
+        
+        system_prompt, prompt, cache_namespace = build_chat_prompt(context, query, show_sources)
+        
+        # Serve repeated questions from the cache
+        cache_key, cached = await get_cached_response(prompt, cache_namespace)
+        if cached is not None:
+            if response_meta is not None:
+                response_meta["cache_hit"] = True
+                response_meta["cacheable"] = True
+            return cached
+        
+        response = await groq_client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            model=GROQ_MODEL,
+            max_tokens=1024,
+            temperature=0.7
+        )
+        
+        content = response.choices[0].message.content
+        await store_cached_response(cache_key, query, cache_namespace, content)
+        if response_meta is not None and cache_namespace is not None:
+            response_meta["cacheable"] = True
+        return content
+    except Exception as e:
+        return format_ai_error(e, query)
 
-async def ingest_from_url(url: str, depth: int = 1) -> int:
-    """Ingest content from URL with specified depth"""
+async def stream_ai_response(context: str, query: str, show_sources: bool = False,
+                             response_meta: Optional[Dict] = None):
+    """Yield the AI response incrementally as Groq streams tokens"""
+    try:
+        if not GROQ_API_KEY:
+            yield OFFLINE_RESPONSE
+            return
+        
+        system_prompt, prompt, cache_namespace = build_chat_prompt(context, query, show_sources)
+        
+        cache_key, cached = await get_cached_response(prompt, cache_namespace)
+        if cached is not None:
+            if response_meta is not None:
+                response_meta["cache_hit"] = True
+                response_meta["cacheable"] = True
+            yield cached
+            return
+        
+        stream = await groq_client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            model=GROQ_MODEL,
+            max_tokens=1024,
+            temperature=0.7,
+            stream=True
+        )
+        
+        parts = []
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content or ""
+            if delta:
+                parts.append(delta)
+                yield delta
+        
+        await store_cached_response(cache_key, query, cache_namespace, "".join(parts))
+        if response_meta is not None and cache_namespace is not None:
+            response_meta["cacheable"] = True
+    except Exception as e:
+        yield format_ai_error(e, query)
+
+async def ingest_from_url(url: str, depth: int, http_client: httpx.AsyncClient,
+                          max_pages: int = MAX_CRAWL_PAGES,
+                          pending_summaries: Optional[List[tuple]] = None,
+                          progress: Optional[Dict] = None) -> int:
+    """Ingest content from URL with specified depth using a concurrent breadth-first crawl.
+
+    When ``pending_summaries`` is a list, pages that need an LLM summary are stored
+    with an extractive one and their (url, content, title) appended for
+    ``refresh_summaries`` to fill in after the request returns. When ``progress``
+    is a dict, its pages_scheduled/pages_crawled/pages_ingested counters are kept
+    current as the crawl runs.
+    """
     ingested_count = 0
+    scheduled_count = 0
+    pending_writes = []
     visited_urls = set()
+    queue = asyncio.Queue()
     
-    async def scrape_page(page_url: str, current_depth: int):
-        nonlocal ingested_count
+    def enqueue(page_url: str, page_depth: int):
+        nonlocal scheduled_count
         
-        if current_depth > depth or page_url in visited_urls:
+        # No await between the check and the add, so workers on this event loop
+        # cannot interleave here and the visited set needs no lock
+        if (page_depth > depth or page_url in visited_urls
+                or scheduled_count >= max_pages):
             return
-        
         visited_urls.add(page_url)
+        scheduled_count += 1
+        if progress is not None:
+            progress["pages_scheduled"] = scheduled_count
+        
+        queue.put_nowait((page_url, page_depth))
+    
+    async def flush_writes():
+        nonlocal ingested_count
         
+        # Take the pending batch before awaiting so concurrent pages start a new one
+        ops = pending_writes[:]
+        pending_writes.clear()
+        if not ops:
+            return
+        try:
+            result = await knowledge_collection.bulk_write(ops, ordered=False)
+            ingested_count += result.upserted_count
+        except BulkWriteError as e:
+            # Unordered writes: the other pages were still stored
+            ingested_count += e.details.get("nUpserted", 0)
+            print(f"Error storing some crawled pages: {e.details.get('writeErrors')}")
+        except Exception as e:
+            print(f"Error storing crawled pages: {e}")
+        if progress is not None:
+            progress["pages_ingested"] = ingested_count
+    
+    def follow_links(links: List[str], current_depth: int):
+        if current_depth < depth:
+            for full_url in links:
+                enqueue(full_url, current_depth + 1)
+    
+    async def scrape_page(client: httpx.AsyncClient, page_url: str, current_depth: int):
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(page_url)
+            # Conditional request using the validators stored on the previous crawl
+            existing = await knowledge_collection.find_one(
+                {"url": page_url},
+                {"_id": 0, "content_fp": 1, "content_hash": 1, "etag": 1, "last_modified": 1, "links": 1}
+            )
+            headers = {}
+            if existing:
+                if existing.get("etag"):
+                    headers["If-None-Match"] = existing["etag"]
+                if existing.get("last_modified"):
+                    headers["If-Modified-Since"] = existing["last_modified"]
+            
+            # Stream the body so oversized pages are cut off instead of buffered whole
+            async with client.stream("GET", page_url, headers=headers) as response:
+                if response.status_code == 304:
+                    # Validators are only sent for stored pages; a 304 to a plain GET has nothing to ingest
+                    if existing:
+                        follow_links(existing.get("links", []), current_depth)
+                    return
                 response.raise_for_status()
                 
-                soup = BeautifulSoup(response.content, 'html.parser')
+                # Only HTML is downloaded and parsed; linked PDFs, images and feeds are skipped
+                content_type = response.headers.get("content-type", "text/html")
+                if "html" not in content_type:
+                    return
+                
+                # Read decoded chunks up to the cap; Content-Length counts compressed bytes, so it
+                # cannot bound a gzip body, and stopping early never inflates the rest
+                buffer = bytearray()
+                async for chunk in response.aiter_bytes():
+                    buffer.extend(chunk)
+                    if len(buffer) >= MAX_PAGE_BYTES:
+                        break
+                body = bytes(buffer[:MAX_PAGE_BYTES])
+            
+            # Skip summary, extraction and the write entirely when the body is unchanged
+            content_fp = hashlib.blake2b(body, digest_size=16).hexdigest()
+            if existing and existing.get("content_fp") == content_fp:
+                follow_links(existing.get("links", []), current_depth)
+                return
+            
+            # Large pages are parsed in the process pool so the event loop keeps serving
+            # other requests; small ones parse faster inline than the round-trip would take
+            if parse_pool is not None and len(body) >= PARSE_OFFLOAD_BYTES:
+                title_text, content, links = await asyncio.get_running_loop().run_in_executor(
+                    parse_pool, parse_page, body, page_url
+                )
+            else:
+                title_text, content, links = parse_page(body, page_url)
+            
+            if len(content) > 100:  # Only store meaningful content
+                etag = response.headers.get("etag")
+                last_modified = response.headers.get("last-modified")
+                
+                # Release the raw page before awaiting the summary, so workers
+                # waiting on Groq hold only the capped text rather than a whole document each
+                del body, response
                 
-                # Extract content
-                title = soup.find('title')
-                title_text = title.get_text().strip() if title else urlparse(page_url).path
+                # Markup changed but the stored text did not: refresh the validators only,
+                # keeping the existing summary and metadata (no Groq call, no re-extraction)
+                content_hash = hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+                crawl_state = {
+                    "links": links,
+                    "content_fp": content_fp,
+                    "etag": etag,
+                    "last_modified": last_modified
+                }
+                if existing and existing.get("content_hash") == content_hash:
+                    pending_writes.append(UpdateOne({"url": page_url}, {"$set": crawl_state}))
+                    if len(pending_writes) >= BULK_WRITE_BATCH:
+                        await flush_writes()
+                    follow_links(links, current_depth)
+                    return
                 
-                # Remove script and style elements
-                for script in soup(["script", "style"]):
-                    script.decompose()
+                # Generate enhanced summary, batched with concurrently crawled pages; when the
+                # caller defers LLM summaries, store a local summary now and queue the page
+                summary_input = content[:2000]
+                if pending_summaries is not None and GROQ_API_KEY and not is_short_content(summary_input):
+                    summary = extractive_summary(summary_input)
+                    pending_summaries.append((page_url, summary_input, title_text))
+                else:
+                    summary = await summary_batcher.submit(summary_input, title_text)
                 
-                # Extract text content
-                content = soup.get_text()
-                content = re.sub(r'\s+', ' ', content).strip()
+                # Extract enhanced entities and tags from the text that is actually stored
+                entities, tags, keywords = extract_page_metadata(title_text, content)
                 
-                if len(content) > 100:  # Only store meaningful content
-                    # Generate enhanced summary
-                    summary = await generate_enhanced_summary(content[:2000], title_text)
-                    
-                    # Extract enhanced entities and tags
-                    entities = extract_enhanced_entities(content)
-                    tags = extract_enhanced_tags(title_text, content)
-                    keywords = extract_keywords(title_text, content)
-                    
-                    # Store in knowledge base with enhanced metadata
-                    knowledge_entry = {
-                        "id": str(uuid.uuid4()),
-                        "title": title_text,
-                        "content": content[:8000],  # Increased content size
-                        "url": page_url,
-                        "summary": summary,
-                        "entities": entities,
-                        "tags": tags,
-                        "keywords": keywords,
-                        "content_type": "webpage",
-                        "domain": urlparse(page_url).netloc,
-                        "ingested_at": datetime.utcnow()
-                    }
-                    
-                    # Check if already exists
-                    existing = knowledge_collection.find_one({"url": page_url})
-                    if existing:
-                        knowledge_collection.update_one(
-                            {"url": page_url},
-                            {"$set": knowledge_entry}
-                        )
-                    else:
-                        knowledge_collection.insert_one(knowledge_entry)
-                    
-                    ingested_count += 1
-                    
-                    # Extract links for deeper crawling
-                    if current_depth < depth:
-                        links = soup.find_all('a', href=True)
-                        for link in links[:10]:  # Limit links to prevent explosion
-                            href = link['href']
-                            full_url = urljoin(page_url, href)
-                            
-                            # Only follow HTTP/HTTPS links on same domain
-                            if full_url.startswith(('http://', 'https://')):
-                                parsed_original = urlparse(page_url)
-                                parsed_new = urlparse(full_url)
-                                
-                                if parsed_original.netloc == parsed_new.netloc:
-                                    await scrape_page(full_url, current_depth + 1)
+                # Store in knowledge base with enhanced metadata
+                knowledge_entry = {
+                    "title": title_text,
+                    "content": content,
+                    "url": page_url,
+                    "summary": summary,
+                    "entities": entities,
+                    "tags": tags,
+                    "keywords": keywords,
+                    "search_tokens": build_search_tokens(keywords, tags, entities),
+                    "content_type": "webpage",
+                    "domain": urlparse(page_url).netloc,
+                    "content_hash": content_hash,
+                    "updated_at": datetime.utcnow(),
+                    **crawl_state
+                }
+                if embedding_model is not None:
+                    knowledge_entry["embedding"] = (await embed_texts([f"{title_text} {summary}"]))[0]
                 
+                # Upsert backed by the unique url index, written in one bulk request after the crawl;
+                # a revisited page keeps its id and original ingestion time
+                pending_writes.append(UpdateOne(
+                    {"url": page_url},
+                    {"$set": knowledge_entry,
+                     "$setOnInsert": {"id": str(uuid.uuid4()), "ingested_at": datetime.utcnow()}},
+                    upsert=True
+                ))
+                if len(pending_writes) >= BULK_WRITE_BATCH:
+                    await flush_writes()
+                
+                # Enqueue same-domain links for the next depth level
+                follow_links(links, current_depth)
+            
         except Exception as e:
             print(f"Error scraping {page_url}: {e}")
     
-    await scrape_page(url, 1)
+    async def worker(client: httpx.AsyncClient):
+        while True:
+            page_url, current_depth = await queue.get()
+            try:
+                await scrape_page(client, page_url, current_depth)
+            finally:
+                if progress is not None:
+                    progress["pages_crawled"] = progress.get("pages_crawled", 0) + 1
+                queue.task_done()
+    
+    # Every worker shares the app-wide keep-alive client
+    enqueue(url, 1)
+    # No more workers than pages the crawl can schedule
+    workers = [asyncio.create_task(worker(http_client)) for _ in range(min(CRAWL_WORKERS, max_pages))]
+    await queue.join()
+    for task in workers:
+        task.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    
+    await flush_writes()
+    
+    add_to_kb_count(ingested_count)
     return ingested_count
 
 
 
 
-async def generate_enhanced_summary(content: str, title: str) -> str:
+def parse_page(body: bytes, page_url: str) -> tuple:
+    """Parse raw HTML into (title, capped text, same-domain links); pure so it can run in a worker process"""
+    tree = LexborHTMLParser(body)
+    
+    # Extract content
+    title = tree.css_first('title')
+    title_text = title.text().strip() if title else urlparse(page_url).path
+    
+    # Remove non-visible subtrees (scripts, styles, inline SVG, templates) in one pass
+    tree.strip_tags(['script', 'style', 'noscript', 'svg', 'template', 'iframe'])
+    
+    # Extract text content
+    # Collapse only the slice that can end up stored, not the whole document
+    content = tree.body.text(separator=' ') if tree.body else ''
+    content = _RE_WS.sub(' ', content[:RAW_TEXT_MAX_CHARS]).strip()[:CONTENT_MAX_CHARS]
+    
+    # Same-domain links, stored so unchanged pages can still be crawled through
+    # Scanned straight from the raw bytes rather than walking the parse tree
+    links = []
+    page_netloc = urlparse(page_url).netloc
+    for href in _RE_HREF.findall(body)[:10]:  # Limit links to prevent explosion
+        full_url = urljoin(page_url, href.decode('ascii', 'ignore'))
+        
+        # Only follow HTTP/HTTPS links on same domain
+        if full_url.startswith(('http://', 'https://')) and urlparse(full_url).netloc == page_netloc:
+            links.append(full_url)
+    
+    return title_text, content, links
+
+async def refresh_summaries(pending_summaries: List[tuple]):
+    """Replace the provisional summaries of freshly crawled pages with LLM summaries"""
+    try:
+        summaries = await asyncio.gather(*(
+            summary_batcher.submit(content, title) for _, content, title in pending_summaries
+        ))
+        updates = [{"summary": summary} for summary in summaries]
+        
+        # Embeddings were taken over the provisional summaries; re-encode them in one batch
+        if embedding_model is not None:
+            vectors = await embed_texts([
+                f"{title} {summary}" for (_, _, title), summary in zip(pending_summaries, summaries)
+            ])
+            for update, vector in zip(updates, vectors):
+                update["embedding"] = vector
+        
+        await knowledge_collection.bulk_write([
+            UpdateOne({"url": page_url}, {"$set": update})
+            for (page_url, _, _), update in zip(pending_summaries, updates)
+        ], ordered=False)
+        
+        # Contexts and answers built from the provisional summaries are now stale
+        await bump_kb_generation()
+        print(f"Refreshed summaries for {len(pending_summaries)} pages")
+    except Exception as e:
+        print(f"Summary refresh error: {e}")
+
+def is_short_content(content: str) -> bool:
+    """Whether content is small or repetitive enough to summarize without the LLM"""
+    if (len(content) < EXTRACTIVE_SUMMARY_MAX_CHARS
+            or len(_RE_SENTENCE.split(content)) < EXTRACTIVE_SUMMARY_MIN_SENTENCES):
+        return True
+    
+    # Boilerplate such as menus, sidebars and index listings repeats the same few words
+    words = content.lower().split()
+    return (len(words) < LLM_SUMMARY_MIN_WORDS
+            or len(set(words)) / len(words) < LLM_SUMMARY_MIN_UNIQUE_RATIO)
+
+def extractive_summary(content: str, max_sentences: int = EXTRACTIVE_SUMMARY_SENTENCES) -> str:
+    """Pick the highest-scoring sentences by word frequency, kept in their original order"""
+    if len(content) < SUMMARY_PASSTHROUGH_CHARS:
+        return content
+    
+    sentences = [sentence.strip() for sentence in _RE_SENTENCE.split(content) if sentence.strip()]
+    if len(sentences) <= max_sentences:
+        # Menus and listings rarely split into sentences; a fixed-length lead beats the whole text
+        return content[:SUMMARY_FALLBACK_CHARS].rstrip() + "..."
+    
+    word_freq = Counter(_RE_WORD3.findall(content.lower()))
+    scores = []
+    for i, sentence in enumerate(sentences):
+        words = _RE_WORD3.findall(sentence.lower())
+        scores.append((sum(word_freq[word] for word in words) / (len(words) or 1), i))
+    
+    top = sorted(i for _, i in sorted(scores, reverse=True)[:max_sentences])
+    summary = " ".join(sentences[i] for i in top)
+    # Run-on "sentences" can still be page-sized, and summaries go into every chat context
+    if len(summary) > EXTRACTIVE_SUMMARY_MAX_CHARS:
+        summary = summary[:EXTRACTIVE_SUMMARY_MAX_CHARS].rstrip() + "..."
+    return summary
+
+async def generate_enhanced_summary(content: str, title: str, force_llm: bool = False) -> str:
     """Generate enhanced summary using Groq with title context"""
     try:
         if not GROQ_API_KEY:
             return content[:300] + "..."
         
-        response = groq_client.chat.completions.create(
+        if not force_llm and is_short_content(content):
+            return extractive_summary(content)
+        
+        cache_key = hashlib.sha256((content[:1000] + title).encode()).hexdigest()
+        cached = summary_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        response = await groq_client.chat.completions.create(
             messages=[
-                {"role": "system", "content": "You are a helpful AI assistant that creates concise, informative summaries."},
+                {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
                 {"role": "user", "content": f"Create a comprehensive summary of this content about '{title}':\n\n{content}"}
             ],
-            model="llama3-70b-8192",
+            model=GROQ_MODEL,
             max_tokens=200,
             temperature=0.3
         )
         
-        return response.choices[0].message.content
+        summary = response.choices[0].message.content
+        summary_cache.set(cache_key, summary)
+        return summary
     except Exception as e:
         print(f"Enhanced summary generation error: {e}")
         return content[:300] + "..."
 
-def extract_enhanced_entities(content: str) -> List[str]:
-    """Extract enhanced entities from content"""
-    entities = []
+async def generate_batch_summaries(documents: List[tuple]) -> List[str]:
+    """Summarize several (content, title) documents with a single Groq call"""
+    sections = "\n\n".join(
+        f"Document {i} - '{title}':\n{content}"
+        for i, (content, title) in enumerate(documents, 1)
+    )
+    response = await groq_client.chat.completions.create(
+        messages=[
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": f"Summarize each of the following {len(documents)} documents. Return only a JSON list of {len(documents)} summary strings, in the same order as the documents.\n\n{sections}"}
+        ],
+        model=GROQ_MODEL,
+        max_tokens=200 * len(documents),
+        temperature=0.3
+    )
     
-    # Extract capitalized words (potential proper nouns)
-    words = re.findall(r'\b[A-Z][a-z]+(?:\s[A-Z][a-z]+)*\b', content)
-    entities.extend(list(set(words))[:15])
+    reply = response.choices[0].message.content
+    match = _RE_JSON_LIST.search(reply)
+    summaries = json.loads(match.group(0)) if match else None
+    if (not isinstance(summaries, list) or len(summaries) != len(documents)
+            or not all(isinstance(summary, str) for summary in summaries)):
+        raise ValueError("Batch summary response is not a JSON list of the expected length")
+    return summaries
+
+class SummaryBatcher:
+    """Coalesce summary requests arriving within a short window into one Groq call.
+
+    Callers await ``submit``; a background task drains up to ``batch_max`` queued
+    requests (or whatever arrived within ``batch_timeout`` seconds) and resolves
+    each caller's future. Up to ``max_concurrency`` batches are resolved at once,
+    and while all of them are busy new requests keep coalescing into the next batch.
+    Requests fall back to individual calls when the batched reply cannot be parsed.
+    """
+
+    def __init__(self, batch_max: int = 8, batch_timeout: float = 0.05, max_concurrency: int = 4):
+        self.batch_max = batch_max
+        self.batch_timeout = batch_timeout
+        self.max_concurrency = max_concurrency
+        self._queue = None
+        self._task = None
+        self._slots = None
+        self._inflight = set()
+
+    async def submit(self, content: str, title: str, force_llm: bool = False) -> str:
+        if not GROQ_API_KEY:
+            return content[:300] + "..."
+        
+        if not force_llm and is_short_content(content):
+            return extractive_summary(content)
+        
+        cache_key = hashlib.sha256((content[:1000] + title).encode()).hexdigest()
+        cached = summary_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._task = asyncio.create_task(self._run())
+        
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((content, title, cache_key, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_timeout
+            while len(batch) < self.batch_max:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._slots.acquire()
+            task = asyncio.create_task(self._resolve(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._release)
     
-    # Extract dates
-    dates = re.findall(r'\b\d{4}\b|\b\d{1,2}/\d{1,2}/\d{4}\b|\b\d{1,2}\s\w+\s\d{4}\b', content)
-    entities.extend(dates[:5])
+    def _release(self, task: asyncio.Task):
+        self._inflight.discard(task)
+        self._slots.release()
+
+    async def _resolve(self, batch: List[tuple]):
+        summaries = None
+        if len(batch) > 1:
+            try:
+                summaries = await generate_batch_summaries([(content, title) for content, title, _, _ in batch])
+            except Exception as e:
+                print(f"Batch summary generation error, falling back to single requests: {e}")
+        
+        if summaries is None:
+            # Individual fallbacks run concurrently rather than one Groq round-trip after another
+            summaries = await asyncio.gather(*(
+                generate_enhanced_summary(content, title) for content, title, _, _ in batch
+            ))
+        else:
+            for (_, _, cache_key, _), summary in zip(batch, summaries):
+                summary_cache.set(cache_key, summary)
+        
+        for (_, _, _, future), summary in zip(batch, summaries):
+            if not future.done():
+                future.set_result(summary)
+
+summary_batcher = SummaryBatcher(
+    batch_max=SUMMARY_BATCH_MAX, batch_timeout=SUMMARY_BATCH_TIMEOUT, max_concurrency=SUMMARY_CONCURRENCY
+)
+
+def build_search_tokens(keywords: List[str], tags: List[str], entities: List[str]) -> List[str]:
+    """Normalize keywords, tags and entity words into one lowercase array for $in lookups"""
+    tokens = dict.fromkeys(keywords)
+    tokens.update(dict.fromkeys(tags))
+    for entity in entities:
+        tokens.update(dict.fromkeys(
+            word for word in _RE_WORD3.findall(entity.lower()) if word not in _STOP_WORDS
+        ))
+    return list(tokens)
+
+def count_words(content_lower: str) -> Counter:
+    """Count alphabetic words of 3+ letters, excluding stop words, in first-seen order"""
+    return Counter(word for word in _RE_WORD3.findall(content_lower) if word not in _STOP_WORDS)
+
+def extract_page_metadata(title: str, content: str) -> tuple:
+    """Extract (entities, tags, keywords), memoized on a hash of the title and content"""
+    cache_key = ResponseCache.make_key(title, content)
+    cached = extraction_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    # Lowercase and count the page's words once for both tag and keyword extraction
+    content_lower = content.lower()
+    word_counts = count_words(content_lower)
+    metadata = (
+        extract_enhanced_entities(content),
+        extract_enhanced_tags(title, content, content_lower, word_counts),
+        extract_keywords(title, content, content_lower, word_counts)
+    )
+    extraction_cache.set(cache_key, metadata)
+    return metadata
+
+def extract_enhanced_entities(content: str) -> List[str]:
+    """Extract enhanced entities from content"""
+    # Single pass collecting proper nouns, dates and numbers with units,
+    # stopping as soon as every bucket has reached its quota
+    quotas = {"proper": 15, "date": 5, "number": 5}
+    # Each bucket is an insertion-ordered dict so duplicates are dropped as they are found
+    found = {"proper": {}, "date": {}, "number": {}}
+    unfilled = len(quotas)
+    for match in _RE_ENTITY.finditer(content):
+        kind = match.lastgroup
+        bucket = found[kind]
+        if len(bucket) >= quotas[kind]:
+            continue
+        bucket[match.group()] = None
+        if len(bucket) == quotas[kind]:
+            unfilled -= 1
+            if not unfilled:
+                break
     
-    # Extract numbers with units
-    numbers = re.findall(r'\b\d+(?:\.\d+)?\s*(?:percent|%|million|billion|thousand|km|miles|years?|days?)\b', content, re.IGNORECASE)
-    entities.extend(numbers[:5])
+    # Capitalized words (potential proper nouns), then dates, then numbers with units;
+    # the buckets match disjoint patterns so no further dedup is needed
+    entities = [*found["proper"], *found["date"], *found["number"]]
     
-    return list(set(entities))[:20]
+    return entities[:20]
 
-def extract_enhanced_tags(title: str, content: str) -> List[str]:
+def extract_enhanced_tags(title: str, content: str, content_lower: Optional[str] = None,
+                          word_counts: Optional[Counter] = None) -> List[str]:
     """Extract enhanced tags from title and content"""
-    tags = []
+    if content_lower is None:
+        content_lower = content.lower()
+    if word_counts is None:
+        word_counts = count_words(content_lower)
+    
+    # Insertion-ordered dict used as a set: tags are deduplicated as they are added
+    tags = {}
     
     # Extract keywords from title
-    title_words = re.findall(r'\b\w+\b', title.lower())
-    tags.extend([word for word in title_words if len(word) > 3])
-    
-    # Common topic categories
-    categories = {
-        'technology': ['technology', 'software', 'computer', 'digital', 'internet', 'ai', 'artificial intelligence', 'machine learning'],
-        'science': ['science', 'research', 'study', 'experiment', 'discovery', 'theory'],
-        'history': ['history', 'historical', 'ancient', 'century', 'war', 'empire'],
-        'geography': ['country', 'city', 'region', 'continent', 'ocean', 'mountain'],
-        'business': ['company', 'business', 'economy', 'market', 'industry', 'financial'],
-        'health': ['health', 'medical', 'disease', 'treatment', 'medicine', 'hospital']
-    }
+    title_words = _RE_TOKEN.findall(title.lower())
+    tags.update(dict.fromkeys(word for word in title_words if len(word) > 3))
     
-    content_lower = content.lower()
-    for category, keywords in categories.items():
-        if any(keyword in content_lower for keyword in keywords):
-            tags.append(category)
+    # Common topic categories; str's C substring search stops at the first hit per
+    # category and beats a lookahead alternation that is retried at every position
+    tags.update(dict.fromkeys(
+        category for category, keywords in TOPIC_CATEGORIES.items()
+        if any(keyword in content_lower for keyword in keywords)
+    ))
     
     # Extract frequent meaningful words
-    words = re.findall(r'\b[a-zA-Z]{4,}\b', content.lower())
-    word_freq = {}
-    for word in words:
-        word_freq[word] = word_freq.get(word, 0) + 1
-    
-    frequent_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
-    tags.extend([word for word, freq in frequent_words[:10] if freq > 2])
+    # Top 10 of the 4+ letter words seen more than twice, straight off the shared counts
+    # (what most_common does internally, without building a filtered Counter first)
+    frequent_words = heapq.nlargest(
+        10,
+        ((word, count) for word, count in word_counts.items() if len(word) > 3 and count > 2),
+        key=itemgetter(1)
+    )
+    tags.update(dict.fromkeys(word for word, _ in frequent_words))
     
-    return list(set(tags))[:15]
+    return list(tags)[:15]
 
-def extract_keywords(title: str, content: str) -> List[str]:
+def extract_keywords(title: str, content: str, content_lower: Optional[str] = None,
+                     word_counts: Optional[Counter] = None) -> List[str]:
     """Extract searchable keywords from content"""
-    keywords = []
+    if content_lower is None:
+        content_lower = content.lower()
+    if word_counts is None:
+        word_counts = count_words(content_lower)
+    
+    # Insertion-ordered dict used as a set: keywords are deduplicated as they are added
+    keywords = {}
     
     # Title words
-    title_words = re.findall(r'\b\w+\b', title.lower())
-    keywords.extend([word for word in title_words if len(word) > 2])
+    title_words = _RE_TOKEN.findall(title.lower())
+    keywords.update(dict.fromkeys(word for word in title_words if len(word) > 2))
     
     # Important phrases (quoted text, bold text indicators)
-    phrases = re.findall(r'"([^"]+)"', content)
+    phrases = _RE_QUOTED.findall(content)
     for phrase in phrases:
-        keywords.extend(phrase.lower().split())
-    
-    # Words that appear multiple times
-    words = re.findall(r'\b[a-zA-Z]{3,}\b', content.lower())
-    word_count = {}
-    for word in words:
-        word_count[word] = word_count.get(word, 0) + 1
+        keywords.update(dict.fromkeys(phrase.lower().split()))
     
     # Add words that appear 3+ times
-    frequent_keywords = [word for word, count in word_count.items() if count >= 3]
-    keywords.extend(frequent_keywords[:20])
+    frequent_keywords = [word for word, count in word_counts.items() if count >= 3]
+    keywords.update(dict.fromkeys(frequent_keywords[:20]))
     
-    return list(set(keywords))[:25]
+    return list(keywords)[:25]
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    # uvloop/httptools when installed ("auto" falls back to asyncio/h11), one worker per core
+    # (override with WEB_CONCURRENCY)
+    uvicorn.run(
+        "server:app",
+        host="0.0.0.0",
+        port=8001,
+        workers=int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1)),
+        loop="auto",
+        http="auto"
+    )
\ No newline at end of file
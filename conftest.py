@@ -0,0 +1,20 @@
+"""pytest hooks for the API tests in backend_test.py"""
+import pytest
+import backend_test
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "integration: needs a live backend with its database and LLM")
+
+def pytest_collection_modifyitems(session, config, items):
+    """Mark the live tests (skipped under ZARK_INTEGRATION=0) and order ZarkAIAPITest like load_suite(),
+    so the knowledge-base clears run after the tests that need content"""
+    skip_integration = pytest.mark.skip(reason="ZARK_INTEGRATION=0: no live backend")
+    for item in items:
+        if getattr(item, 'cls', None) is backend_test.ZarkAIAPITest:
+            item.add_marker("integration")
+            if not backend_test.RUN_INTEGRATION:
+                item.add_marker(skip_integration)
+    order = backend_test.SERIAL_BEFORE + backend_test.READ_ONLY + backend_test.SERIAL_AFTER
+    rank = {name: index for index, name in enumerate(order)}
+    # Stable sort: other items keep their place ahead of the API tests, unlisted API tests go last
+    items.sort(key=lambda item: rank.get(item.name, len(rank)) if getattr(item, 'cls', None) is backend_test.ZarkAIAPITest else -1)
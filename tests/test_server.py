@@ -0,0 +1,531 @@
+"""Behavior tests for backend/server.py against the real app with its dependencies stubbed"""
+import asyncio
+import multiprocessing
+import sys
+import time
+import unittest
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+from pymongo import IndexModel
+
+from backend_test import BACKEND_DIR, STUB_ANSWER, StubbedAppTestCase, make_page
+
+sys.path.insert(0, BACKEND_DIR)
+from llm_cache import ResponseCache
+
+class TextSearchCollection:
+    """Knowledge collection whose $text queries return canned ranked results; mongomock has no $text"""
+    
+    def __init__(self, collection, ranked):
+        self.collection = collection
+        self.ranked = ranked
+        self.text_queries = []
+        
+    def find(self, query, *args, **kwargs):
+        if "$text" in query:
+            self.text_queries.append(query["$text"]["$search"])
+            ranked = [dict(entry, score=1.0) for entry in self.ranked]
+            return mock.Mock(sort=lambda *_: mock.Mock(to_list=mock.AsyncMock(return_value=ranked)))
+        return self.collection.find(query, *args, **kwargs)
+        
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+class SearchKnowledgeTest(StubbedAppTestCase):
+    """search_knowledge's text tier, prefix top-up and keyword, prefix and recency fallbacks"""
+    
+    def search(self, query, limit=5):
+        return [entry["title"] for entry in self.call(self.server.search_knowledge, query, limit)]
+        
+    def with_text_results(self, *entries):
+        ranked = [{key: entry[key] for key in ("id", "title", "url")} for entry in entries]
+        collection = TextSearchCollection(self.server.knowledge_collection, ranked)
+        return collection, mock.patch.object(self.server, "knowledge_collection", collection)
+        
+    def test_empty_knowledge_base(self):
+        """No entries, no results, and no fallback queries"""
+        self.assertEqual(self.search("artificial intelligence"), [])
+        
+    def test_text_results_topped_up_by_prefixes(self):
+        """A short ranked list is topped up with prefix matches it does not already hold"""
+        ranked = self.insert_knowledge(title="Ranked", search_tokens=["intelligence"])
+        self.insert_knowledge(title="Prefix", search_tokens=["intelligent"])
+        self.insert_knowledge(title="Unrelated", search_tokens=["cooking"])
+        collection, patch = self.with_text_results(ranked)
+        with patch:
+            self.assertEqual(self.search("the intelli"), ["Ranked", "Prefix"])
+        # Plain terms only, so the text index never treats the query as a phrase or negation
+        self.assertEqual(collection.text_queries, ["the intelli"])
+        
+    def test_text_error_falls_back(self):
+        """A failing $text query (mongomock has none, like a missing kb_text) still runs the fallbacks"""
+        self.insert_knowledge(title="Keyword", search_tokens=["robotics"])
+        self.insert_knowledge(title="Other", search_tokens=["cooking"])
+        with mock.patch("builtins.print") as printed:
+            self.assertEqual(self.search("robotics"), ["Keyword"])
+        logged = " ".join(str(call.args[0]) for call in printed.call_args_list)
+        self.assertIn("Text search error", logged)
+        self.assertNotIn("Search error", logged)
+        
+    def test_prefix_fallback(self):
+        """Partial words match token and tag prefixes when no whole keyword does"""
+        self.insert_knowledge(title="Tagged", tags=["robotics"])
+        self.insert_knowledge(title="Other", search_tokens=["cooking"])
+        self.assertEqual(self.search("robot"), ["Tagged"])
+        
+    def test_recency_fallback(self):
+        """With no keyword or prefix match the most recently ingested entries are returned"""
+        now = datetime.utcnow()
+        self.insert_knowledge(title="Older", ingested_at=now - timedelta(days=1))
+        self.insert_knowledge(title="Newer", ingested_at=now)
+        self.assertEqual(self.search("quantum chromodynamics"), ["Newer", "Older"])
+        
+    def test_stop_words_only(self):
+        """A query of stop words has no tokens and goes straight to recent entries"""
+        self.insert_knowledge(title="Only")
+        self.assertEqual(self.search("what is the"), ["Only"])
+
+class FailingIndexCollection:
+    """Collection stub whose create_indexes fails for the named indexes"""
+    name = "knowledge"
+    
+    def __init__(self, failing):
+        self.failing = failing
+        self.created = []
+        
+    async def create_indexes(self, models):
+        name = models[0].document["name"]
+        if name in self.failing:
+            raise RuntimeError(f"cannot build {name}")
+        self.created.append(name)
+
+class CreateIndexesTest(StubbedAppTestCase):
+    """Each index is built on its own and a missing kb_text is reported"""
+    
+    def test_one_failure_leaves_the_rest(self):
+        collection = FailingIndexCollection({"url_1"})
+        failed = self.call(self.server.create_index_set, collection, [
+            IndexModel("url", unique=True), IndexModel("tags"), IndexModel("search_tokens")
+        ])
+        self.assertEqual(failed, ["url_1"])
+        self.assertEqual(collection.created, ["tags_1", "search_tokens_1"])
+        
+    def test_missing_kb_text_is_logged(self):
+        with mock.patch.object(self.server, "knowledge_collection", FailingIndexCollection({"kb_text"})), \
+                mock.patch("builtins.print") as printed:
+            self.call(self.server.create_indexes)
+        logged = [str(call.args[0]) for call in printed.call_args_list]
+        self.assertTrue(any(line.startswith("ERROR: knowledge index kb_text is missing") for line in logged))
+
+class ResponseCacheTest(unittest.TestCase):
+    """Exact-key TTL/LRU behavior of the in-process cache tier"""
+    
+    def test_exact_keys_only(self):
+        """A similar-looking query is a different key and never reuses an entry"""
+        cache = ResponseCache()
+        cache.set(ResponseCache.make_key("What is AI?"), "answer")
+        self.assertEqual(cache.get(ResponseCache.make_key("What is AI?")), "answer")
+        self.assertIsNone(cache.get(ResponseCache.make_key("What is AI")))
+        self.assertEqual(cache.stats(), {"entries": 1, "hits": 1, "misses": 1})
+        
+    def test_key_parts_are_separated(self):
+        self.assertNotEqual(ResponseCache.make_key("ab", "c"), ResponseCache.make_key("a", "bc"))
+        
+    def test_expiry_and_eviction(self):
+        """Expired entries miss, and the least recently used entry goes first when full"""
+        cache = ResponseCache(maxsize=2, ttl=-1)
+        cache.set("expired", "value")
+        self.assertIsNone(cache.get("expired"))
+        
+        cache = ResponseCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c")), (1, 3))
+
+class ChatCacheTest(StubbedAppTestCase):
+    """Which chat answers are reused from the local and shared tiers, and which never are"""
+    
+    def answer(self, query, **fields):
+        return self.chat(query, **fields).json()["response"]
+        
+    def test_repeat_question_skips_the_model(self):
+        first = self.answer("What is artificial intelligence?")
+        self.assertEqual(self.answer("  what is ARTIFICIAL intelligence?  "), first)
+        self.assertEqual(len(self.groq.requests), 1)
+        
+    def test_shared_tier_answers_another_worker(self):
+        """With this worker's caches empty the Mongo tier still answers, and refills the local tier"""
+        first = self.answer("What is artificial intelligence?")
+        self.server.chat_cache.clear()
+        self.server.response_cache.clear()
+        self.assertEqual(self.answer("What is artificial intelligence?"), first)
+        self.assertEqual(len(self.groq.requests), 1)
+        self.assertEqual(self.server.response_cache.stats()["entries"], 1)
+        stored = self.call(self.server.response_cache_collection.find_one, {})
+        self.assertEqual((stored["query"], stored["response"]), ("What is artificial intelligence?", first))
+        
+    def test_show_sources_is_part_of_the_key(self):
+        self.answer("What is artificial intelligence?")
+        self.answer("What is artificial intelligence?", show_sources=True)
+        self.assertEqual(len(self.groq.requests), 2)
+        
+    def test_detailed_requests_are_never_cached(self):
+        self.assertEqual(self.answer("Give me a detailed history of AI"), STUB_ANSWER.format(n=1))
+        self.assertEqual(self.answer("Give me a detailed history of AI"), STUB_ANSWER.format(n=2))
+        self.assertEqual(self.call(self.server.response_cache_collection.count_documents, {}), 0)
+        
+    def test_offline_answers_are_not_cached(self):
+        """Offline text is not a model answer, so it is not reused once a key is configured"""
+        with mock.patch.object(self.server, "GROQ_API_KEY", None):
+            self.assertEqual(self.answer("What is artificial intelligence?"), self.server.OFFLINE_RESPONSE)
+        self.assertEqual(self.answer("What is artificial intelligence?"), STUB_ANSWER.format(n=1))
+
+class KnowledgeGenerationTest(StubbedAppTestCase):
+    """Chat caches follow the shared knowledge-base generation, whichever worker changed it"""
+    
+    def generation(self):
+        meta = self.call(self.server.kb_meta_collection.find_one, {"_id": "generation"})
+        return meta["value"] if meta else 0
+        
+    def test_other_worker_change_invalidates(self):
+        """Content added and announced elsewhere is used by the next identical question"""
+        self.chat("What is robotics?")
+        self.insert_knowledge(title="Robotics", search_tokens=["robotics"])
+        self.call(self.server.kb_meta_collection.update_one,
+                  {"_id": "generation"}, {"$inc": {"value": 1}}, upsert=True)
+                  
+        data = self.chat("What is robotics?", show_sources=True).json()
+        self.assertEqual(len(self.groq.requests), 2)
+        self.assertEqual(data["sources"], ["Robotics: https://example.org/robotics"])
+        self.assertEqual(self.server.kb_generation, 1)
+        
+    def test_local_writes_bump_the_generation(self):
+        self.chat("What is robotics?")
+        self.assertEqual(self.session.delete("/api/knowledge").json()["total"], 0)
+        self.assertEqual(self.generation(), 1)
+        self.assertEqual(self.server.chat_cache.stats()["entries"], 0)
+        
+        url = "https://example.org/robotics"
+        self.site.add(url, make_page("Robotics", "Robots are machines that sense and act. " * 5))
+        self.session.post("/api/ingest", json={"url": url})
+        self.assertEqual(self.generation(), 2)
+        
+    def test_unreadable_generation_is_not_cached(self):
+        """Without the generation an answer could outlive a change, so it is not stored"""
+        with mock.patch.object(self.server.kb_meta_collection, "find_one", side_effect=RuntimeError("down")):
+            response = self.chat("What is robotics?")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.chat_cache.stats()["entries"], 0)
+
+class ConditionalCrawlTest(StubbedAppTestCase):
+    """Re-crawls send the stored validators and skip work for unchanged pages"""
+    
+    url = "https://example.org/ai"
+    linked = "https://example.org/ml"
+    text = "Artificial intelligence studies agents that perceive and act. " * 5
+    
+    def ingest(self, depth=2):
+        return self.session.post("/api/ingest", json={"url": self.url, "depth": depth}).json()
+        
+    def stored(self):
+        return self.call(self.server.knowledge_collection.find_one, {"url": self.url})
+        
+    def add_pages(self, body=None, **headers):
+        self.site.add(self.url, body or make_page("AI", self.text, [self.linked]), headers=headers)
+        self.site.add(self.linked, make_page("ML", "Machine learning fits models to data. " * 5))
+        
+    def requested(self, url):
+        return [request for request in self.site.requests if str(request.url) == url]
+        
+    def test_not_modified_keeps_entry_and_follows_links(self):
+        self.add_pages(etag='"v1"', **{'last-modified': 'Mon, 05 Oct 2026 10:00:00 GMT'})
+        self.assertEqual(self.ingest()["total_entries"], 2)
+        before = self.stored()
+        
+        self.site.requests.clear()
+        self.site.add(self.url, status=304)
+        self.assertIn("ingested 0 pages", self.ingest()["message"])
+        headers = self.requested(self.url)[0].headers
+        self.assertEqual(headers["if-none-match"], '"v1"')
+        self.assertEqual(headers["if-modified-since"], 'Mon, 05 Oct 2026 10:00:00 GMT')
+        self.assertEqual(len(self.requested(self.linked)), 1)
+        self.assertEqual(self.stored(), before)
+        
+    def test_not_modified_without_stored_page(self):
+        """A 304 to a request that carried no validators is skipped without a crawl error"""
+        self.site.add(self.url, status=304)
+        with mock.patch("builtins.print") as printed:
+            self.assertIn("ingested 0 pages", self.ingest()["message"])
+        self.assertNotIn("Error scraping", " ".join(str(call.args[0]) for call in printed.call_args_list))
+        self.assertNotIn("if-none-match", self.requested(self.url)[0].headers)
+        
+    def test_identical_body_is_not_rewritten(self):
+        self.add_pages()
+        self.ingest()
+        before = self.stored()
+        self.site.requests.clear()
+        self.ingest()
+        self.assertEqual(self.stored(), before)
+        self.assertEqual(len(self.requested(self.linked)), 1)
+        
+    def test_markup_change_refreshes_validators_only(self):
+        """Same text in new markup keeps the summary and metadata and stores the new validators"""
+        self.add_pages()
+        self.ingest(depth=1)
+        before = self.stored()
+        
+        self.add_pages(body=make_page("AI", self.text, [self.linked]).replace(b"<p>", b"<p class=\"lead\">"), etag='"v2"')
+        self.ingest(depth=1)
+        after = self.stored()
+        self.assertEqual(after["etag"], '"v2"')
+        self.assertNotEqual(after["content_fp"], before["content_fp"])
+        for field in ("summary", "updated_at", "content_hash", "id"):
+            self.assertEqual(after[field], before[field])
+            
+    def test_changed_text_is_reingested_in_place(self):
+        """New text is re-extracted; the entry keeps its id and first ingestion time"""
+        self.add_pages()
+        self.ingest(depth=1)
+        before = self.stored()
+        
+        self.add_pages(body=make_page("AI", "Robotics builds machines that move and sense. " * 5))
+        self.ingest(depth=1)
+        after = self.stored()
+        self.assertNotEqual(after["content_hash"], before["content_hash"])
+        self.assertIn("Robotics", after["content"])
+        self.assertEqual((after["id"], after["ingested_at"]), (before["id"], before["ingested_at"]))
+        self.assertEqual(self.call(self.server.knowledge_collection.count_documents, {}), 1)
+
+class IngestJobTest(StubbedAppTestCase):
+    """Background ingestion jobs: accepted, polled from Mongo, finished or failed, never reopened"""
+    
+    url = "https://example.org/ai"
+    
+    def start_job(self):
+        response = self.session.post("/api/ingest", json={"url": self.url, "background": True})
+        self.assertEqual(response.status_code, 202)
+        return response.json()
+        
+    def wait_for_job(self, status_url, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.session.get(status_url).json()
+            if job["status"] != "running" or time.monotonic() > deadline:
+                return job
+            time.sleep(0.01)
+            
+    def test_completed_job(self):
+        self.site.add(self.url, make_page("AI", "Artificial intelligence studies intelligent agents. " * 5))
+        accepted = self.start_job()
+        self.assertEqual(accepted["status_url"], f"/api/ingest/{accepted['job_id']}")
+        
+        job = self.wait_for_job(accepted["status_url"])
+        self.assertEqual(job["status"], "completed")
+        self.assertEqual((job["url"], job["total_entries"]), (self.url, 1))
+        self.assertEqual((job["pages_scheduled"], job["pages_crawled"], job["pages_ingested"]), (1, 1, 1))
+        self.assertIn("finished_at", job)
+        
+    def test_failed_job(self):
+        with mock.patch.object(self.server, "run_ingestion", side_effect=RuntimeError("crawler down")):
+            job = self.wait_for_job(self.start_job()["status_url"])
+        self.assertEqual((job["status"], job["error"]), ("failed", "crawler down"))
+        
+    def publish_for(self, job, seconds):
+        async def publish():
+            publisher = asyncio.create_task(self.server.publish_ingest_progress(job))
+            await asyncio.sleep(seconds)
+            publisher.cancel()
+            await asyncio.gather(publisher, return_exceptions=True)
+        with mock.patch.object(self.server, "INGEST_PROGRESS_INTERVAL", 0.01):
+            self.call(publish)
+            
+    def test_progress_is_published_while_running(self):
+        job = {"job_id": "job-1", "status": "running", "pages_scheduled": 0, "pages_crawled": 0, "pages_ingested": 0}
+        self.call(self.server.save_ingest_job, job)
+        job.update(pages_scheduled=3, pages_crawled=2, pages_ingested=1)
+        self.publish_for(job, 0.05)
+        stored = self.call(self.server.ingest_jobs_collection.find_one, {"job_id": "job-1"}, {"_id": 0})
+        self.assertEqual(stored, job)
+        
+    def test_late_progress_write_keeps_the_outcome(self):
+        """A progress write landing after the final save cannot put the job back to running"""
+        job = {"job_id": "job-2", "status": "completed", "pages_scheduled": 1, "pages_crawled": 1, "pages_ingested": 1}
+        self.call(self.server.save_ingest_job, job)
+        self.publish_for(dict(job, status="running", pages_crawled=0), 0.05)
+        stored = self.call(self.server.ingest_jobs_collection.find_one, {"job_id": "job-2"}, {"_id": 0})
+        self.assertEqual(stored, job)
+
+class CountingProcessPool(ProcessPoolExecutor):
+    """The app's forkserver pool, counting the parses handed to it"""
+    
+    def __init__(self):
+        super().__init__(max_workers=1, mp_context=multiprocessing.get_context("forkserver"))
+        self.submitted = 0
+        
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+class ParsePageTest(StubbedAppTestCase):
+    """parse_page's output, and large pages parsed in the process pool with the same result"""
+    
+    def test_text_title_and_links(self):
+        body = (b"<html><head><title> Page </title><style>p {}</style></head><body>"
+                b"<script>tracker()</script><p>First\n\n   second</p><svg><text>icon</text></svg>"
+                b"<a href='/local'>l</a><a href=\"https://other.org/x\">o</a><a href='mailto:a@b.c'>m</a>"
+                b"</body></html>")
+        title, content, links = self.server.parse_page(body, "https://example.org/dir/page")
+        self.assertEqual(title, "Page")
+        self.assertEqual(content, "First second l o m")
+        self.assertEqual(links, ["https://example.org/local"])
+        
+    def test_limits(self):
+        """No title falls back to the path; text is capped and only the first ten hrefs are scanned"""
+        anchors = "".join(f'<a href="/p{i}">p</a>' for i in range(20))
+        body = f"<body><p>{'word ' * 5000}</p>{anchors}</body>".encode()
+        title, content, links = self.server.parse_page(body, "https://example.org/start")
+        self.assertEqual(title, "/start")
+        self.assertEqual(len(content), self.server.CONTENT_MAX_CHARS)
+        self.assertEqual(links, [f"https://example.org/p{i}" for i in range(10)])
+        
+    def test_pool_matches_inline(self):
+        body = make_page("AI", "Artificial intelligence studies agents. " * 3000, ["https://example.org/ml"])
+        with CountingProcessPool() as pool:
+            pooled = pool.submit(self.server.parse_page, body, "https://example.org/ai").result()
+        self.assertEqual(pooled, self.server.parse_page(body, "https://example.org/ai"))
+        
+    def test_large_pages_are_offloaded(self):
+        small, large = "https://example.org/small", "https://example.org/large"
+        self.site.add(small, make_page("Small", "Short pages parse inline on the event loop. " * 5, [large]))
+        self.site.add(large, make_page("Large", "Large pages are parsed in a worker process. " * 2000))
+        with CountingProcessPool() as pool, mock.patch.object(self.server, "parse_pool", pool):
+            result = self.session.post("/api/ingest", json={"url": small, "depth": 2}).json()
+        self.assertEqual(pool.submitted, 1)
+        self.assertEqual(result["total_entries"], 2)
+        stored = self.call(self.server.knowledge_collection.find_one, {"url": large})
+        self.assertEqual(stored["title"], "Large")
+
+class StubEmbeddingModel:
+    """SentenceTransformer stand-in: each text maps to [length, word count]"""
+    
+    def __init__(self, name):
+        self.name = name
+        
+    def encode(self, texts, normalize_embeddings=False):
+        return mock.Mock(tolist=lambda: [[float(len(text)), float(len(text.split()))] for text in texts])
+
+class VectorSearchTest(StubbedAppTestCase):
+    """With VECTOR_SEARCH_INDEX set, entries are embedded and searched by vector before text"""
+    server_overrides = {"VECTOR_SEARCH_INDEX": "kb_vectors"}
+    
+    @classmethod
+    def setUpClass(cls):
+        cls._modules = mock.patch.dict(sys.modules, {"sentence_transformers": mock.Mock(SentenceTransformer=StubEmbeddingModel)})
+        cls._modules.start()
+        super().setUpClass()
+        
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._modules.stop()
+        
+    def test_model_loaded_at_startup(self):
+        self.assertEqual(self.server.embedding_model.name, self.server.EMBEDDING_MODEL)
+        
+    def test_ingested_entries_are_embedded(self):
+        url = "https://example.org/ai"
+        self.site.add(url, make_page("AI", "Artificial intelligence studies intelligent agents. " * 5))
+        self.session.post("/api/ingest", json={"url": url})
+        stored = self.call(self.server.knowledge_collection.find_one, {"url": url})
+        text = f"{stored['title']} {stored['summary']}"
+        self.assertEqual(stored["embedding"], [float(len(text)), float(len(text.split()))])
+        
+    def test_vector_results_come_first(self):
+        matched = {"id": "1", "title": "Nearest", "url": "https://example.org/n", "score": 0.9}
+        aggregate = mock.Mock(return_value=mock.Mock(to_list=mock.AsyncMock(return_value=[matched])))
+        with mock.patch.object(self.server.knowledge_collection, "aggregate", aggregate):
+            results = self.call(self.server.search_knowledge, "what is AI", 3, total_count=1)
+        self.assertEqual(results, [matched])
+        stage = aggregate.call_args.args[0][0]["$vectorSearch"]
+        self.assertEqual((stage["index"], stage["limit"], stage["queryVector"]), ("kb_vectors", 3, [10.0, 3.0]))
+        
+    def test_vector_search_error_falls_back(self):
+        """mongomock has no $vectorSearch; the keyword tier still answers"""
+        self.insert_knowledge(title="Keyword", search_tokens=["robotics"])
+        results = self.call(self.server.search_knowledge, "robotics")
+        self.assertEqual([entry["title"] for entry in results], ["Keyword"])
+
+class VectorSearchUnavailableTest(StubbedAppTestCase):
+    """VECTOR_SEARCH_INDEX without sentence-transformers installed leaves retrieval text-only"""
+    server_overrides = {"VECTOR_SEARCH_INDEX": "kb_vectors"}
+    
+    @classmethod
+    def setUpClass(cls):
+        # A None entry makes the import raise ImportError, as if the package were missing
+        cls._modules = mock.patch.dict(sys.modules, {"sentence_transformers": None})
+        cls._modules.start()
+        super().setUpClass()
+        
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._modules.stop()
+        
+    def test_starts_without_the_model(self):
+        self.assertIsNone(self.server.embedding_model)
+        self.assertEqual(self.session.get("/api/health").json()["status"], "healthy")
+        url = "https://example.org/ai"
+        self.site.add(url, make_page("AI", "Artificial intelligence studies intelligent agents. " * 5))
+        self.session.post("/api/ingest", json={"url": url})
+        self.assertNotIn("embedding", self.call(self.server.knowledge_collection.find_one, {"url": url}))
+
+class SummaryTest(StubbedAppTestCase):
+    """Local extractive summaries for short pages, LLM summaries filled in after ingestion for long ones"""
+    
+    varied = " ".join(f"Sentence {i} covers topic{i} and concept{i * 7} in detail{i * 3}." for i in range(40))
+    
+    def test_short_text_passes_through(self):
+        self.assertEqual(self.server.extractive_summary("A short page."), "A short page.")
+        
+    def test_few_sentences_keep_a_capped_lead(self):
+        menu = "Home Products About Contact Careers Blog " * 20
+        self.assertEqual(self.server.extractive_summary(menu), menu[:self.server.SUMMARY_FALLBACK_CHARS].rstrip() + "...")
+        
+    def test_top_sentences_in_page_order(self):
+        # Words fused with digits are not counted, so filler sentences score zero
+        filler = [f"Filler{i} line{i} holds{i} item{i} part{i}." for i in range(10)]
+        key = ["Robots use sensors.", "Robots use motors and sensors.", "Robots use sensors, motors and robots."]
+        content = " ".join(filler[:4] + key[:1] + filler[4:7] + key[1:] + filler[7:])
+        summary = self.server.extractive_summary(content)
+        self.assertEqual(summary, " ".join(key))
+        
+    def test_run_on_sentences_are_capped(self):
+        run_on = " ".join(f"clause{i} and more words" for i in range(200))
+        content = ". ".join([run_on] * 5) + "."
+        summary = self.server.extractive_summary(content)
+        self.assertTrue(summary.endswith("..."))
+        self.assertLessEqual(len(summary), self.server.EXTRACTIVE_SUMMARY_MAX_CHARS + len("..."))
+        
+    def test_short_content(self):
+        """Small, few-sentence or repetitive text is summarized locally; varied prose goes to the LLM"""
+        self.assertTrue(self.server.is_short_content("One sentence."))
+        self.assertTrue(self.server.is_short_content("Buy now. " * 200))
+        self.assertFalse(self.server.is_short_content(self.varied))
+        
+    def test_long_pages_get_llm_summaries_after_ingestion(self):
+        url = "https://example.org/long"
+        self.site.add(url, make_page("Long", self.varied))
+        with mock.patch.object(self.server, "extractive_summary", wraps=self.server.extractive_summary) as extractive:
+            self.session.post("/api/ingest", json={"url": url})
+        # Stored first with the local summary, replaced by the model's once the response was sent
+        extractive.assert_called_once()
+        stored = self.call(self.server.knowledge_collection.find_one, {"url": url})
+        self.assertEqual(stored["summary"], STUB_ANSWER.format(n=1))
+        self.assertEqual(len(self.groq.requests), 1)
+
+if __name__ == "__main__":
+    unittest.main()